@@ -0,0 +1,121 @@
+"""
+Сравнение режимов генерации постов two_stage и one_shot на заглушке модели.
+
+    python -m benchmarks.post_generation --runs 10
+
+Заглушка имитирует задержку модели как сумму фиксированной части и
+времени на обработку входных и генерацию выходных токенов, поэтому
+результат показывает, сколько стоят лишний запрос и повторная передача
+структуры в промпте.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from services.post_generator import PostGenerator
+
+
+def estimate_tokens(text: str) -> int:
+    # Грубая оценка: около 4 символов на токен
+    return max(1, len(text) // 4)
+
+
+class StubAIService:
+    """Заглушка GoogleAIService с задержкой, зависящей от числа токенов"""
+
+    def __init__(self, base_latency=0.5, prompt_token_latency=0.0002, output_token_latency=0.01,
+                 structure_tokens=200, content_tokens=350, latency_scale=1.0):
+        self.base_latency = base_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.output_token_latency = output_token_latency
+        self.structure_tokens = structure_tokens
+        self.content_tokens = content_tokens
+        self.latency_scale = latency_scale
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    async def generate_post(self, prompt, use_cache=False):
+        structure = "Структура: вступление, три совета, вывод. " * (self.structure_tokens * 4 // 42)
+        content = "Пример текста поста для родителей. " * (self.content_tokens * 4 // 35)
+
+        if '"content"' in prompt:
+            # Режим one_shot: краткая структура и текст в одном ответе
+            output = json.dumps({'structure': structure[:len(structure) // 3], 'content': content}, ensure_ascii=False)
+        elif 'Наполни следующую' in prompt:
+            output = content
+        else:
+            output = structure
+
+        prompt_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(output)
+        latency = (
+            self.base_latency
+            + prompt_tokens * self.prompt_token_latency
+            + output_tokens * self.output_token_latency
+        )
+        await asyncio.sleep(latency * self.latency_scale)
+
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.output_tokens += output_tokens
+        return output
+
+
+class StubScraper:
+    """Заглушка Scraper с одной фиксированной статьей"""
+
+    async def scrape_by_category(self, category, language='ru'):
+        return [{
+            'title': 'Как поддержать ребенка с особенностями развития',
+            'content': 'Регулярные занятия и спокойная обстановка помогают ребенку. ' * 20,
+            'source_name': 'Stub',
+            'source_url': 'https://example.com'
+        }]
+
+
+async def run_mode(mode: str, runs: int, latency_scale: float):
+    ai_service = StubAIService(latency_scale=latency_scale)
+    generator = PostGenerator(ai_service, StubScraper())
+    random.seed(0)
+
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await generator.generate_ai_post(category='parenting', mode=mode)
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'mean': sum(latencies) / runs,
+        'p50': latencies[runs // 2],
+        'max': latencies[-1],
+        'calls': ai_service.calls / runs,
+        'prompt_tokens': ai_service.prompt_tokens / runs,
+        'output_tokens': ai_service.output_tokens / runs,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк режимов генерации постов')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Множитель задержек заглушки, например 0.1 для быстрого прогона')
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'mean, s':>8} {'p50, s':>8} {'max, s':>8} {'calls':>6} {'prompt tok':>11} {'output tok':>11}")
+    for mode in ('two_stage', 'one_shot'):
+        result = await run_mode(mode, args.runs, args.latency_scale)
+        print(
+            f"{result['mode']:<10} {result['mean']:>8.2f} {result['p50']:>8.2f} {result['max']:>8.2f} "
+            f"{result['calls']:>6.1f} {result['prompt_tokens']:>11.0f} {result['output_tokens']:>11.0f}"
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -13,15 +13,109 @@ ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS', '').split(',')))
 
 # Google AI Configuration
 GOOGLE_AI_API_KEY = os.getenv('GOOGLE_AI_API_KEY')
+# Бэкенд модели: 'gemini' или 'fake' - локальная замена для работы без сети
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+LLM_MODEL_NAME = os.getenv('LLM_MODEL_NAME', 'gemini-pro')
+# Параметры FakeBackend: медиана задержки до первого токена (сек), разброс, скорость выдачи, доля сбоев
+FAKE_LLM_LATENCY = float(os.getenv('FAKE_LLM_LATENCY', '1.0'))
+FAKE_LLM_LATENCY_SPREAD = float(os.getenv('FAKE_LLM_LATENCY_SPREAD', '0.5'))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv('FAKE_LLM_TOKENS_PER_SECOND', '50'))
+FAKE_LLM_FAILURE_RATE = float(os.getenv('FAKE_LLM_FAILURE_RATE', '0'))
+# Максимум одновременных запросов к модели и таймаут одного запроса (сек)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_TIMEOUT = int(os.getenv('LLM_TIMEOUT', '60'))
+# Лимиты провайдера в минуту (0 - без ограничения) и ограничения очереди запросов к модели
+LLM_RPM_LIMIT = int(os.getenv('LLM_RPM_LIMIT', '60'))
+LLM_TPM_LIMIT = int(os.getenv('LLM_TPM_LIMIT', '0'))
+LLM_MAX_QUEUE_DEPTH = int(os.getenv('LLM_MAX_QUEUE_DEPTH', '50'))
+LLM_MAX_QUEUE_WAIT = float(os.getenv('LLM_MAX_QUEUE_WAIT', '30'))  # сек
+# Дублирование медленных запросов после перцентиля задержки и предохранитель от серии сбоев
+LLM_HEDGING = os.getenv('LLM_HEDGING', 'true').lower() == 'true'
+LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+LLM_BREAKER_RESET_TIMEOUT = float(os.getenv('LLM_BREAKER_RESET_TIMEOUT', '30'))  # сек
+# Бюджеты токенов: на пользователя в скользящем окне и суммарно за сутки (0 - без ограничений)
+LLM_USER_TOKEN_BUDGET = int(os.getenv('LLM_USER_TOKEN_BUDGET', '20000'))
+LLM_USER_TOKEN_WINDOW = int(os.getenv('LLM_USER_TOKEN_WINDOW', '3600'))  # сек
+LLM_DAILY_TOKEN_BUDGET = int(os.getenv('LLM_DAILY_TOKEN_BUDGET', '0'))
+# Потоковая выдача ответов пользователям с периодическим редактированием сообщения
+LLM_STREAMING = os.getenv('LLM_STREAMING', 'true').lower() == 'true'
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.5'))  # сек между правками сообщения
+# Режим генерации постов: 'two_stage' - структура и содержание отдельными запросами, 'one_shot' - одним запросом
+POST_GENERATION_MODE = os.getenv('POST_GENERATION_MODE', 'two_stage')
+
+# Кэш ответов модели для генерации постов: LRU в памяти + SQLite на диске.
+# Включается для разработки: повторная генерация по той же статье отдается из кэша
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'false').lower() == 'true'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'llm_cache.db')
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))  # сек
+LLM_CACHE_MEMORY_SIZE = int(os.getenv('LLM_CACHE_MEMORY_SIZE', '256'))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
 
 # Database Configuration
 DATABASE_URL = os.getenv('DATABASE_URL')
+# Размер пула потоков для обращений к БД из асинхронных обработчиков
+DB_MAX_WORKERS = int(os.getenv('DB_MAX_WORKERS', '4'))
+# Профиль БД: 'production' - WAL, настроенные PRAGMA и пул соединений, 'default' - настройки SQLAlchemy
+DB_PROFILE = os.getenv('DB_PROFILE', 'production')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # мс
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '20000'))  # КиБ
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # байт
+
+# QA Matching Configuration
+# 'words' - пословное сравнение с инвертированным индексом, 'tfidf' - символьные n-граммы TF-IDF,
+# 'fts' - отбор кандидатов полнотекстовым индексом SQLite FTS5
+QA_MATCHER = os.getenv('QA_MATCHER', 'words')
+# Сколько лучших по bm25 кандидатов FTS5 проверять пословным сравнением
+QA_FTS_TOP_K = int(os.getenv('QA_FTS_TOP_K', '20'))
+# Через сколько добавленных вопросов пересчитывать IDF матрицы TF-IDF
+QA_TFIDF_REBUILD_EVERY = int(os.getenv('QA_TFIDF_REBUILD_EVERY', '1000'))
+
+# Content Filter Configuration
+# Запрещенные слова в вопросах пользователей и расширенный список для запросов к модели
+DANGEROUS_KEYWORDS = [
+    'hack', 'exploit', 'injection', 'malware',
+    'вирус', 'атака', 'взлом', 'шпионаж',
+    'паролей', 'данные', 'кража', 'trojans'
+]
+TOXIC_KEYWORDS = DANGEROUS_KEYWORDS + ['насилие', 'оскорбление', 'дискриминация']
+# JSON-файл со списками, перечитывается при изменении без перезапуска
+CONTENT_FILTER_PATH = os.getenv('CONTENT_FILTER_PATH', '')
+# Искать только целые слова, а не подстроки
+CONTENT_FILTER_WHOLE_WORDS = os.getenv('CONTENT_FILTER_WHOLE_WORDS', 'false').lower() == 'true'
+CONTENT_FILTER_RELOAD_INTERVAL = float(os.getenv('CONTENT_FILTER_RELOAD_INTERVAL', '30'))  # сек
 
 # Scraping Configuration
 SCRAPING_INTERVAL = int(os.getenv('SCRAPING_INTERVAL', '3600'))
+# Случайный разброс интервала обхода источников (доля от SCRAPING_INTERVAL)
+SCRAPING_JITTER = float(os.getenv('SCRAPING_JITTER', '0.1'))
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
 REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', '30'))
 CONCURRENT_REQUESTS = int(os.getenv('CONCURRENT_REQUESTS', '3'))
+# Вежливость к источникам: запросов к одному хосту одновременно, пауза между ними и предел паузы при повторах
+SCRAPER_PER_HOST_CONCURRENCY = int(os.getenv('SCRAPER_PER_HOST_CONCURRENCY', '1'))
+SCRAPER_HOST_MIN_DELAY = float(os.getenv('SCRAPER_HOST_MIN_DELAY', '1.0'))  # сек
+SCRAPER_MAX_BACKOFF = float(os.getenv('SCRAPER_MAX_BACKOFF', '60'))  # сек
+# Предел размера загружаемой страницы, байт (переопределяется полем max_bytes источника)
+SCRAPER_MAX_BYTES = int(os.getenv('SCRAPER_MAX_BYTES', str(2 * 1024 * 1024)))
+# Пул соединений скрапера: кэш DNS и время жизни keep-alive соединений
+SCRAPER_DNS_CACHE_TTL = int(os.getenv('SCRAPER_DNS_CACHE_TTL', '300'))  # сек
+SCRAPER_KEEPALIVE_TIMEOUT = float(os.getenv('SCRAPER_KEEPALIVE_TIMEOUT', '30'))  # сек
+# Кэш доступности хостов: срок жизни для доступных и недоступных хостов
+SCRAPER_HOST_TTL = float(os.getenv('SCRAPER_HOST_TTL', '300'))  # сек
+SCRAPER_HOST_NEGATIVE_TTL = float(os.getenv('SCRAPER_HOST_NEGATIVE_TTL', '60'))  # сек
+# HTTP-кэш страниц источников (условные запросы по ETag / Last-Modified)
+HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', 'true').lower() == 'true'
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH', 'http_cache.db')
+HTTP_CACHE_MAX_BYTES = int(os.getenv('HTTP_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+# Сколько секунд страница считается свежей и отдается без запроса (0 - всегда перепроверять)
+HTTP_CACHE_FRESHNESS = int(os.getenv('HTTP_CACHE_FRESHNESS', '0'))  # сек
+# Разбор HTML: html.parser, lxml или selectolax; число процессов пула (0 - разбор в потоке)
+HTML_PARSER_BACKEND = os.getenv('HTML_PARSER_BACKEND', 'html.parser')
+HTML_PARSER_WORKERS = int(os.getenv('HTML_PARSER_WORKERS', '2'))
 
 def create_lenient_ssl_context():
     context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
@@ -41,7 +135,13 @@ class MedicalSource:
     requires_js: bool = False
     pagination: Optional[Dict[str, str]] = None
     ssl_context: Optional[ssl.SSLContext] = None
-    verify_ssl: bool = True  
+    verify_ssl: bool = True
+    # Переопределение HTTP_CACHE_FRESHNESS для источника, сек
+    cache_ttl: Optional[int] = None
+    # Переопределение HTML_PARSER_BACKEND для источника
+    parser: Optional[str] = None
+    # Переопределение SCRAPER_MAX_BYTES для источника
+    max_bytes: Optional[int] = None
 
 # Существующие источники остаются без изменений
 MEDICAL_SOURCES = [
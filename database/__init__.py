@@ -1,3 +1,4 @@
-from .db_manager import DBManager, Post, QA
+from .db_manager import DBManager, Post, QA, Article, ArticleCategory
+from .async_db_manager import AsyncDBManager
 
-__all__ = ['DBManager', 'Post', 'QA']
\ No newline at end of file
+__all__ = ['DBManager', 'AsyncDBManager', 'Post', 'QA', 'Article', 'ArticleCategory']
\ No newline at end of file
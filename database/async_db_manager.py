@@ -0,0 +1,48 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from config.config import DB_MAX_WORKERS
+from database.db_manager import DBManager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDBManager:
+    """
+    Асинхронная обертка над DBManager.
+
+    Синхронные методы DBManager выполняются в ограниченном пуле потоков,
+    каждый вызов работает в собственной сессии, поэтому медленные запросы
+    к SQLite не блокируют цикл событий бота.
+    """
+
+    def __init__(self, db: DBManager = None, max_workers: int = DB_MAX_WORKERS):
+        self.db = db or DBManager()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def get_qa(self, question, similarity_threshold=70):
+        return await self._run(self.db.get_qa, question, similarity_threshold)
+
+    async def add_qa(self, question, answer):
+        return await self._run(self.db.add_qa, question, answer)
+
+    async def save_articles(self, articles):
+        return await self._run(self.db.save_articles, articles)
+
+    async def pick_fresh_article(self, category, language='ru'):
+        return await self._run(self.db.pick_fresh_article, category, language)
+
+    async def mark_article_used(self, article_id):
+        return await self._run(self.db.mark_article_used, article_id)
+
+    async def get_all_qa(self):
+        return await self._run(self.db.get_all_qa)
+
+    async def close_connection(self):
+        await self._run(self.db.close_connection)
+        self.executor.shutdown(wait=False)
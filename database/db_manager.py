@@ -1,12 +1,18 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
-from config.config import DATABASE_URL
-import sqlite3
-import re
+from config.config import QA_MATCHER, QA_FTS_TOP_K
+from database.engine import create_db_engine
+from database.migrations import run_migrations, migrate_qa_fts
+from database.qa_index import QAIndex
+from database.tfidf_matcher import TfidfMatcher, TFIDF_AVAILABLE
+from utils.text_processor import normalize_question, question_hash
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import hashlib
 import logging
 import sys
+import threading
 
 # Настройка логирования
 logging.basicConfig(
@@ -21,55 +27,143 @@ logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# Атомарная вставка или обновление ответа по уникальному хэшу вопроса
+UPSERT_QA_SQL = text(
+    "INSERT INTO qa (question, question_normalized, question_hash, answer) "
+    "VALUES (:question, :normalized, :hash, :answer) "
+    "ON CONFLICT (question_hash) DO UPDATE SET answer = excluded.answer"
+)
+
 class Post(Base):
     __tablename__ = 'posts'
     
     id = Column(Integer, primary_key=True)
     content = Column(Text)
     source_url = Column(String(500))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    status = Column(String(50))
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    status = Column(String(50), index=True)
 
 class QA(Base):
     __tablename__ = 'qa'
     
     id = Column(Integer, primary_key=True)
     question = Column(Text)
+    question_normalized = Column(Text, index=True)
+    question_hash = Column(String(40), index=True, unique=True)
     answer = Column(Text)
 
+class Article(Base):
+    __tablename__ = 'articles'
+    __table_args__ = (
+        # Выборка свежей неиспользованной статьи на нужном языке
+        Index('ix_articles_fresh', 'language', 'used_in_post', 'scraped_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    # Хэш заголовка и текста - ключ дедупликации
+    content_hash = Column(String(64), unique=True, nullable=False)
+    title = Column(Text)
+    content = Column(Text)
+    source = Column(String(200), index=True)
+    source_url = Column(String(500))
+    language = Column(String(10), index=True)
+    scraped_at = Column(DateTime, default=datetime.utcnow, index=True)
+    used_in_post = Column(Boolean, default=False, nullable=False)
+
+    def to_dict(self):
+        """Статья в формате результата скрапера"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'content': self.content,
+            'source_name': self.source,
+            'source_url': self.source_url,
+            'language': self.language,
+            'timestamp': self.scraped_at.isoformat() if self.scraped_at else None
+        }
+
+class ArticleCategory(Base):
+    __tablename__ = 'article_categories'
+    __table_args__ = (
+        Index('ix_article_categories_category', 'category', 'article_id'),
+    )
+    
+    article_id = Column(Integer, ForeignKey('articles.id', ondelete='CASCADE'), primary_key=True)
+    category = Column(String(100), primary_key=True)
+
+def article_hash(title, content):
+    """Ключ дедупликации статьи: хэш нормализованных заголовка и текста"""
+    normalized = f"{normalize_question(title or '')}\0{normalize_question(content or '')}"
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
 class DBManager:
     def __init__(self):
-        self.engine = create_engine(DATABASE_URL)
+        self.engine = create_db_engine()
         Base.metadata.create_all(self.engine)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        run_migrations(self.engine)
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        # Индексы в памяти общие для всех потоков
+        self._index_lock = threading.Lock()
+        self.qa_matcher = QA_MATCHER
+        if self.qa_matcher == 'tfidf' and not TFIDF_AVAILABLE:
+            logger.warning("numpy/scipy not installed, falling back to 'words' QA matcher")
+            self.qa_matcher = 'words'
+        if self.qa_matcher == 'fts' and not migrate_qa_fts(self.engine):
+            logger.warning("FTS5 is not available, falling back to 'words' QA matcher")
+            self.qa_matcher = 'words'
+        self.qa_index = QAIndex() if self.qa_matcher == 'words' else None
+        self.tfidf_matcher = TfidfMatcher() if self.qa_matcher == 'tfidf' else None
+        # id вопросов, уже добавленных в индекс в памяти
+        self._indexed_ids = set()
+        self.build_qa_index()
 
     def normalize_text(self, text):
         """
         Нормализация текста для более точного сравнения
         """
-        if not text:
-            return ""
-        
-        # Удаление знаков препинания в начале и конце, приведение к нижнему регистру
-        text = text.strip('?.,()[] ')
-        text = text.lower()
-        
-        # Удаление знаков препинания внутри текста
-        text = re.sub(r'[^\w\s]', '', text)
+        return normalize_question(text)
+
+    def build_qa_index(self):
+        """
+        Построение индекса выбранного движка сравнения по всем вопросам в БД
+        """
+        if self.qa_matcher == 'fts':
+            # Индекс FTS5 хранится в самой БД и поддерживается триггерами
+            return
         
-        # Замена похожих букв
-        text = text.replace('ё', 'е')
+        with self.Session() as session:
+            rows = session.query(QA.id, QA.question_normalized).all()
         
-        # Удаление лишних пробелов
-        text = ' '.join(text.split())
+        with self._index_lock:
+            self._indexed_ids = {qa_id for qa_id, _ in rows}
+            if self.tfidf_matcher:
+                self.tfidf_matcher.build(rows)
+            else:
+                self.qa_index.build(rows)
+
+    def _index_rows(self, rows):
+        """
+        Добавление новых вопросов в индекс в памяти, уже проиндексированные пропускаются
+        """
+        if not (self.tfidf_matcher or self.qa_index):
+            return
         
-        return text
+        with self._index_lock:
+            for qa_id, normalized in rows:
+                if qa_id in self._indexed_ids:
+                    continue
+                self._indexed_ids.add(qa_id)
+                if self.tfidf_matcher:
+                    self.tfidf_matcher.add(qa_id, normalized)
+                else:
+                    self.qa_index.add(qa_id, normalized)
+
     def print_all_qa_questions(self):
         """
         Вывод всех вопросов в базе данных для отладки
         """
-        all_qa_pairs = self.session.query(QA).all()
+        with self.Session() as session:
+            all_qa_pairs = session.query(QA).all()
         logger.debug("=== СПИСОК ВСЕХ ВОПРОСОВ В БД ===")
         for qa in all_qa_pairs:
             logger.debug(f"ID: {qa.id}")
@@ -84,13 +178,12 @@ class DBManager:
         if not text1 or not text2:
             return 0
         
-        # Нормализация текстов
-        norm_text1 = self.normalize_text(text1)
-        norm_text2 = self.normalize_text(text2)
-        
-        logger.debug(f"Normalized input text: {norm_text1}")
-        logger.debug(f"Normalized db text:    {norm_text2}")
-        
+        return self._word_similarity(self.normalize_text(text1), self.normalize_text(text2))
+
+    def _word_similarity(self, norm_text1, norm_text2):
+        """
+        Процент совпадения слов между двумя уже нормализованными текстами
+        """
         # Разбиваем на слова
         words1 = norm_text1.split()
         words2 = norm_text2.split()
@@ -109,64 +202,137 @@ class DBManager:
         
         # Процент совпадения
         max_words_length = max(len(words1), len(words2))
-        similarity = (common_words / max_words_length) * 100
-        
-        logger.debug(f"Common words: {common_words}")
-        logger.debug(f"Total words: {max_words_length}")
-        logger.debug(f"Similarity: {similarity}%")
-        
-        return similarity
+        return (common_words / max_words_length) * 100
     
     def get_qa(self, question, similarity_threshold=70):
         """
         Поиск вопроса с высокой степенью совпадения
         
         :param question: Входящий вопрос
-        :param similarity_threshold: Порог схожести (по умолчанию 75%)
+        :param similarity_threshold: Порог схожести (по умолчанию 70%)
         """
         logger.debug(f"Searching QA for question: {question}")
         
-        # Получаем все существующие вопросы
-        all_qa_pairs = self.session.query(QA).all()
+        norm_input = self.normalize_text(question)
+        logger.debug(f"Normalized input text: {norm_input}")
+        
+        # Вопрос только из знаков препинания или эмодзи ни с чем не сравнивается
+        if not norm_input:
+            logger.warning("Empty normalized question, skipping QA search")
+            return None
+        
+        with self.Session() as session:
+            # Быстрый путь: точное совпадение нормализованного вопроса по индексу
+            exact_match = session.query(QA).filter(
+                QA.question_hash == question_hash(norm_input)
+            ).first()
+            
+            if exact_match:
+                logger.info(f"Exact match found: {exact_match.question}")
+                return exact_match
+            
+            if self.tfidf_matcher:
+                best_match, best_similarity = self._match_tfidf(session, norm_input, similarity_threshold)
+            elif self.qa_matcher == 'fts':
+                best_match, best_similarity = self._match_fts(session, norm_input, similarity_threshold)
+            else:
+                best_match, best_similarity = self._match_words(session, norm_input, similarity_threshold)
+        
+        if best_match:
+            logger.info(f"Best match found: {best_match.question}")
+            logger.info(f"Answer: {best_match.answer}")
+            logger.info(f"Similarity: {best_similarity}%")
+            return best_match
+        
+        logger.warning("No matching QA pair found")
+        return None
+
+    def _match_words(self, session, norm_input, similarity_threshold):
+        """
+        Пословное сравнение с кандидатами из инвертированного индекса
+        """
+        # Отбираем только вопросы, имеющие общие слова с входящим
+        with self._index_lock:
+            candidate_ids = self.qa_index.candidates(norm_input)
+        
+        logger.debug(f"Candidate QA pairs: {len(candidate_ids)} of {self.qa_index.size}")
+        
+        return self._best_word_match(session, norm_input, candidate_ids, similarity_threshold)
+
+    def _match_fts(self, session, norm_input, similarity_threshold):
+        """
+        Отбор кандидатов полнотекстовым индексом FTS5 с ранжированием bm25
+        и пословное сравнение лучших из них
+        """
+        terms = []
+        for word in norm_input.split():
+            terms.append(f'"{word}"*')
+            # Усеченная основа длинных слов, чтобы находить другие словоформы
+            if len(word) > 5:
+                terms.append(f'"{word[:-2]}"*')
+        
+        if not terms:
+            return None, 0
+        
+        rows = session.execute(
+            text("SELECT rowid FROM qa_fts WHERE qa_fts MATCH :query ORDER BY bm25(qa_fts) LIMIT :limit"),
+            {'query': ' OR '.join(terms), 'limit': QA_FTS_TOP_K}
+        ).fetchall()
+        candidate_ids = [row[0] for row in rows]
+        
+        logger.debug(f"FTS candidate QA pairs: {len(candidate_ids)}")
+        
+        return self._best_word_match(session, norm_input, candidate_ids, similarity_threshold)
+
+    def _best_word_match(self, session, norm_input, candidate_ids, similarity_threshold):
+        """
+        Пословное сравнение вопроса с отобранными кандидатами
+        """
+        if not candidate_ids:
+            return None, 0
         
-        logger.debug(f"Total QA pairs in database: {len(all_qa_pairs)}")
+        all_qa_pairs = session.query(QA).filter(QA.id.in_(candidate_ids)).all()
         
         best_match = None
         best_similarity = 0
         
-        # Подробный лог проверки каждой пары
         for qa_pair in all_qa_pairs:
-            norm_input = self.normalize_text(question)
-            norm_db = self.normalize_text(qa_pair.question)
-            
-            similarity = self.calculate_similarity(question, qa_pair.question)
+            similarity = self._word_similarity(norm_input, qa_pair.question_normalized or "")
             
             logger.debug(f"Checking pair:")
-            logger.debug(f"  Input (normalized): {norm_input}")
-            logger.debug(f"  DB Question (normalized): {norm_db}")
+            logger.debug(f"  DB Question (normalized): {qa_pair.question_normalized}")
             logger.debug(f"  Similarity: {similarity}%")
             
-            # Более подробное сравнение
-            logger.debug(f"  Full input question: {question}")
-            logger.debug(f"  Full DB question: {qa_pair.question}")
-            
             if similarity > best_similarity and similarity >= similarity_threshold:
                 best_match = qa_pair
                 best_similarity = similarity
         
-        if best_match:
-            logger.info(f"Best match found: {best_match.question}")
-            logger.info(f"Answer: {best_match.answer}")
-            logger.info(f"Similarity: {best_similarity}%")
-            return best_match
+        return best_match, best_similarity
+
+    def _match_tfidf(self, session, norm_input, similarity_threshold):
+        """
+        Сравнение по символьным n-граммам TF-IDF со всей базой сразу
+        """
+        with self._index_lock:
+            match = self.tfidf_matcher.best_match(norm_input)
         
-        logger.warning("No matching QA pair found")
-        return None
+        if not match:
+            return None, 0
+        
+        qa_id, similarity = match
+        logger.debug(f"Best TF-IDF candidate: {qa_id}, similarity: {similarity}%")
+        
+        if similarity < similarity_threshold:
+            return None, 0
+        
+        return session.get(QA, qa_id), similarity
+
     def manual_similarity_check(self, question):
         """
         Ручная проверка совпадения вопросов
         """
-        all_qa_pairs = self.session.query(QA).all()
+        with self.Session() as session:
+            all_qa_pairs = session.query(QA).all()
         
         print("\n=== MANUAL SIMILARITY CHECK ===")
         print(f"Input question: {question}")
@@ -180,44 +346,218 @@ class DBManager:
 
     def add_qa(self, question, answer):
         """
-        Добавление новой пары вопрос-ответ в базу данных
+        Добавление новой пары вопрос-ответ в базу данных.
+        Вопрос, совпадающий с существующим с точностью до нормализации, обновляет его ответ
         """
-        try:
-            # Проверяем, существует ли уже такой вопрос
-            existing_qa = self.session.query(QA).filter(QA.question == question).first()
+        normalized = self.normalize_text(question)
+        if not normalized:
+            # Иначе такой ответ находился бы для любого вопроса без слов
+            logger.warning(f"Refusing to store QA pair with empty normalized question: {question!r}")
+            return False
+        normalized_hash = question_hash(normalized)
+        
+        with self.Session() as session:
+            try:
+                session.execute(UPSERT_QA_SQL, {
+                    'question': question,
+                    'normalized': normalized,
+                    'hash': normalized_hash,
+                    'answer': answer
+                })
+                row = session.query(QA.id, QA.question_normalized).filter(
+                    QA.question_hash == normalized_hash
+                ).one()
+                
+                # Фиксируем изменения в базе данных
+                session.commit()
             
-            if existing_qa:
-                logger.info(f"QA pair already exists. Updating the existing record.")
-                existing_qa.answer = answer
-            else:
-                # Создаем новую запись, если вопрос не существует
-                new_qa = QA(question=question, answer=answer)
-                self.session.add(new_qa)
+            except Exception as e:
+                # Откатываем транзакцию в случае ошибки
+                session.rollback()
+                logger.error(f"Error adding QA pair: {e}")
+                return False
+        
+        self._index_rows([tuple(row)])
+        
+        logger.info(f"Successfully added/updated QA pair: {question}")
+        return True
+
+    def bulk_import_qa(self, pairs: Iterable[Tuple[str, str]], chunk_size: int = 1000) -> Dict[str, int]:
+        """
+        Массовая загрузка пар вопрос-ответ.
+
+        Пары читаются из итератора порциями по chunk_size, каждая порция
+        нормализуется целиком и записывается одной транзакцией через
+        executemany: существующие вопросы (по хэшу) обновляются, новые
+        добавляются.
+        """
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        chunk = []
+        
+        for question, answer in pairs:
+            chunk.append((question, answer))
+            if len(chunk) >= chunk_size:
+                self._import_qa_chunk(chunk, stats)
+                chunk = []
+        
+        if chunk:
+            self._import_qa_chunk(chunk, stats)
+        
+        logger.info(f"Bulk QA import finished: {stats}")
+        return stats
+
+    def _import_qa_chunk(self, chunk, stats):
+        # Внутри порции повторяющиеся вопросы схлопываются, побеждает последний
+        rows = {}
+        for question, answer in chunk:
+            normalized = self.normalize_text(question)
+            if not normalized or not answer:
+                stats['skipped'] += 1
+                continue
+            normalized_hash = question_hash(normalized)
+            rows[normalized_hash] = {
+                'question': question,
+                'normalized': normalized,
+                'hash': normalized_hash,
+                'answer': answer
+            }
+        
+        if not rows:
+            return
+        
+        with self.Session() as session:
+            try:
+                # Только для статистики: конкурентная запись между этим запросом
+                # и вставкой разрешается самим upsert
+                existing = {
+                    row[0] for row in session.query(QA.question_hash).filter(
+                        QA.question_hash.in_(list(rows))
+                    )
+                }
+                updates = [row for row_hash, row in rows.items() if row_hash in existing]
+                inserts = [row for row_hash, row in rows.items() if row_hash not in existing]
+                
+                session.execute(UPSERT_QA_SQL, list(rows.values()))
+                session.commit()
+                
+                new_rows = []
+                if inserts:
+                    new_rows = session.query(QA.id, QA.question_normalized).filter(
+                        QA.question_hash.in_([row['hash'] for row in inserts])
+                    ).all()
             
-            # Фиксируем изменения в базе данных
-            self.session.commit()
-            logger.info(f"Successfully added/updated QA pair: {question}")
-            return True
-        
-        except Exception as e:
-            # Откатываем транзакцию в случае ошибки
-            self.session.rollback()
-            logger.error(f"Error adding QA pair: {e}")
-            return False
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error importing QA chunk: {e}")
+                raise
+        
+        self._index_rows(new_rows)
+        
+        stats['inserted'] += len(inserts)
+        stats['updated'] += len(updates)
+        logger.info(f"Imported QA chunk: {len(inserts)} inserted, {len(updates)} updated")
+
+    def export_qa(self, chunk_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        """
+        Потоковая выгрузка всех пар вопрос-ответ порциями по chunk_size
+        """
+        with self.Session() as session:
+            query = session.query(QA.question, QA.answer).order_by(QA.id).yield_per(chunk_size)
+            for question, answer in query:
+                yield question, answer
+
+    def save_articles(self, articles: Iterable[Dict]) -> int:
+        """
+        Сохранение статей скрапера, уже известные (по хэшу содержимого) пропускаются
+
+        :return: Количество новых статей
+        """
+        rows = {}
+        for article in articles:
+            if not article.get('title') or not article.get('content'):
+                continue
+            rows[article_hash(article['title'], article['content'])] = article
+        
+        if not rows:
+            return 0
+        
+        with self.Session() as session:
+            try:
+                existing = {
+                    row[0] for row in session.query(Article.content_hash).filter(
+                        Article.content_hash.in_(list(rows))
+                    )
+                }
+                
+                new_articles = []
+                for content_hash, article in rows.items():
+                    if content_hash in existing:
+                        continue
+                    new_article = Article(
+                        content_hash=content_hash,
+                        title=article['title'],
+                        content=article['content'],
+                        source=article.get('source_name'),
+                        source_url=article.get('source_url'),
+                        language=article.get('language'),
+                        scraped_at=datetime.utcnow()
+                    )
+                    session.add(new_article)
+                    new_articles.append((new_article, article.get('category') or []))
+                
+                # Получаем id новых статей для привязки категорий
+                session.flush()
+                for new_article, categories in new_articles:
+                    for category in set(categories):
+                        session.add(ArticleCategory(article_id=new_article.id, category=category))
+                
+                session.commit()
+            
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error saving articles: {e}")
+                return 0
+        
+        logger.info(f"Saved {len(new_articles)} new articles, {len(rows) - len(new_articles)} already known")
+        return len(new_articles)
+
+    def pick_fresh_article(self, category: str, language: str = 'ru') -> Optional[Article]:
+        """
+        Самая свежая статья категории, еще не использованная в посте
+        """
+        with self.Session() as session:
+            return session.query(Article).join(
+                ArticleCategory, ArticleCategory.article_id == Article.id
+            ).filter(
+                ArticleCategory.category == category,
+                Article.language == language,
+                Article.used_in_post.is_(False)
+            ).order_by(Article.scraped_at.desc()).first()
+
+    def mark_article_used(self, article_id: int) -> bool:
+        """
+        Отметка статьи как использованной в посте
+        """
+        with self.Session() as session:
+            updated = session.query(Article).filter(Article.id == article_id).update(
+                {Article.used_in_post: True}
+            )
+            session.commit()
+        return bool(updated)
 
     def close_connection(self):
         """
         Закрытие соединения с базой данных
         """
-        if self.session:
-            self.session.close()
-            logger.info("Database connection closed.")
+        self.engine.dispose()
+        logger.info("Database connection closed.")
 
     def get_all_qa(self):
         """
         Получение всех вопросов из базы данных для отладки
         """
-        all_qa_pairs = self.session.query(QA).all()
+        with self.Session() as session:
+            all_qa_pairs = session.query(QA).all()
         logger.debug("=== ALL QA PAIRS ===")
         for qa in all_qa_pairs:
             logger.debug(f"ID: {qa.id}")
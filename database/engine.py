@@ -0,0 +1,56 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+from config.config import (
+    DATABASE_URL, DB_PROFILE, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    SQLITE_BUSY_TIMEOUT, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Настройка каждого нового соединения SQLite
+    """
+    cursor = dbapi_connection.cursor()
+    # WAL позволяет читателям не блокироваться пишущим соединением
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    # В режиме WAL NORMAL сохраняет целостность БД при сбое процесса
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # Отрицательное значение - размер кэша в КиБ, а не в страницах
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """
+    Создание движка SQLAlchemy с учетом профиля БД
+    """
+    if not url.startswith('sqlite'):
+        return create_engine(url, pool_pre_ping=True)
+
+    # Сессии создаются на каждую операцию и могут жить в разных потоках
+    connect_args = {'check_same_thread': False}
+
+    in_memory = url in ('sqlite://', 'sqlite:///:memory:')
+    if profile != 'production' or in_memory:
+        return create_engine(url, connect_args=connect_args)
+
+    connect_args['timeout'] = SQLITE_BUSY_TIMEOUT / 1000
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True
+    )
+    event.listen(engine, 'connect', _apply_sqlite_pragmas)
+
+    logger.info(f"SQLite production profile enabled (pool_size={DB_POOL_SIZE}, max_overflow={DB_MAX_OVERFLOW})")
+    return engine
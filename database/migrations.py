@@ -0,0 +1,150 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from utils.text_processor import normalize_question, question_hash
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_qa_normalized(engine):
+    """
+    Добавление колонок question_normalized / question_hash в таблицу qa
+    и заполнение их для уже существующих записей
+    """
+    columns = {column['name'] for column in inspect(engine).get_columns('qa')}
+
+    with engine.begin() as conn:
+        if 'question_normalized' not in columns:
+            conn.execute(text("ALTER TABLE qa ADD COLUMN question_normalized TEXT"))
+            logger.info("Added column qa.question_normalized")
+
+        if 'question_hash' not in columns:
+            conn.execute(text("ALTER TABLE qa ADD COLUMN question_hash VARCHAR(40)"))
+            logger.info("Added column qa.question_hash")
+
+        rows = conn.execute(
+            text("SELECT id, question FROM qa WHERE question_hash IS NULL")
+        ).fetchall()
+
+        if rows:
+            params = []
+            for qa_id, question in rows:
+                normalized = normalize_question(question)
+                params.append({
+                    'id': qa_id,
+                    'normalized': normalized,
+                    'hash': question_hash(normalized)
+                })
+
+            conn.execute(
+                text("UPDATE qa SET question_normalized = :normalized, question_hash = :hash WHERE id = :id"),
+                params
+            )
+            logger.info(f"Backfilled normalized questions for {len(rows)} QA pairs")
+
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_qa_question_normalized ON qa (question_normalized)"))
+
+
+def migrate_qa_hash_unique(engine):
+    """
+    Уникальный индекс по question_hash.
+
+    Дубликаты, попавшие в таблицу до появления индекса, объединяются:
+    остается самая ранняя запись с ответом из самой поздней.
+    """
+    indexes = {index['name']: index for index in inspect(engine).get_indexes('qa')}
+    if indexes.get('ix_qa_question_hash', {}).get('unique'):
+        return
+
+    with engine.begin() as conn:
+        duplicates = conn.execute(text(
+            "SELECT question_hash, MIN(id), MAX(id) FROM qa "
+            "WHERE question_hash IS NOT NULL GROUP BY question_hash HAVING COUNT(*) > 1"
+        )).fetchall()
+
+        if duplicates:
+            params = [
+                {'hash': duplicate_hash, 'keep_id': keep_id, 'latest_id': latest_id}
+                for duplicate_hash, keep_id, latest_id in duplicates
+            ]
+            conn.execute(
+                text("UPDATE qa SET answer = (SELECT latest.answer FROM qa AS latest WHERE latest.id = :latest_id) WHERE id = :keep_id"),
+                params
+            )
+            conn.execute(
+                text("DELETE FROM qa WHERE question_hash = :hash AND id != :keep_id"),
+                params
+            )
+            logger.info(f"Merged duplicate QA pairs for {len(duplicates)} questions")
+
+        conn.execute(text("DROP INDEX IF EXISTS ix_qa_question_hash"))
+        conn.execute(text("CREATE UNIQUE INDEX ix_qa_question_hash ON qa (question_hash)"))
+        logger.info("Created unique index ix_qa_question_hash")
+
+
+def migrate_post_indexes(engine):
+    """
+    Индексы для выборки постов по статусу и дате создания
+    """
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_posts_status ON posts (status)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_posts_created_at ON posts (created_at)"))
+
+
+def migrate_qa_fts(engine):
+    """
+    Полнотекстовый индекс FTS5 по нормализованным вопросам.
+
+    Таблица qa_fts хранит только индекс (content='qa'), а триггеры
+    поддерживают его в актуальном состоянии при изменении таблицы qa.
+
+    :return: False, если SQLite собран без FTS5
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'qa_fts'")
+            ).first()
+
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS qa_fts "
+                "USING fts5(question_normalized, content='qa', content_rowid='id')"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS qa_fts_ai AFTER INSERT ON qa BEGIN "
+                "INSERT INTO qa_fts(rowid, question_normalized) VALUES (new.id, new.question_normalized); "
+                "END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS qa_fts_ad AFTER DELETE ON qa BEGIN "
+                "INSERT INTO qa_fts(qa_fts, rowid, question_normalized) VALUES ('delete', old.id, old.question_normalized); "
+                "END"
+            ))
+            conn.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS qa_fts_au AFTER UPDATE OF question_normalized ON qa BEGIN "
+                "INSERT INTO qa_fts(qa_fts, rowid, question_normalized) VALUES ('delete', old.id, old.question_normalized); "
+                "INSERT INTO qa_fts(rowid, question_normalized) VALUES (new.id, new.question_normalized); "
+                "END"
+            ))
+
+            if not exists:
+                conn.execute(text("INSERT INTO qa_fts(qa_fts) VALUES ('rebuild')"))
+                logger.info("Created FTS5 index qa_fts")
+
+        return True
+
+    except OperationalError as e:
+        logger.error(f"FTS5 is not available: {e}")
+        return False
+
+
+def run_migrations(engine):
+    """
+    Применение всех миграций схемы
+    """
+    migrate_qa_normalized(engine)
+    migrate_qa_hash_unique(engine)
+    migrate_post_indexes(engine)
@@ -0,0 +1,85 @@
+"""
+Массовый импорт и экспорт базы вопросов-ответов.
+
+    python -m database.qa_bulk import faq.csv
+    python -m database.qa_bulk export faq.jsonl
+
+CSV - с заголовком и колонками question, answer; JSONL - по объекту
+{"question": ..., "answer": ...} на строку.
+"""
+import argparse
+import csv
+import json
+import os
+from typing import Iterator, Tuple
+from database.db_manager import DBManager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _detect_format(path: str, file_format: str = None) -> str:
+    if file_format:
+        return file_format
+    return 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl'
+
+
+def read_pairs(path: str, file_format: str = None) -> Iterator[Tuple[str, str]]:
+    """Построчное чтение пар вопрос-ответ из CSV или JSONL"""
+    file_format = _detect_format(path, file_format)
+
+    with open(path, encoding='utf-8', newline='') as f:
+        if file_format == 'csv':
+            for row in csv.DictReader(f):
+                yield row.get('question'), row.get('answer')
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                yield item.get('question'), item.get('answer')
+
+
+def write_pairs(path: str, pairs: Iterator[Tuple[str, str]], file_format: str = None) -> int:
+    """Построчная запись пар вопрос-ответ в CSV или JSONL"""
+    file_format = _detect_format(path, file_format)
+    count = 0
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if file_format == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(['question', 'answer'])
+            for question, answer in pairs:
+                writer.writerow([question, answer])
+                count += 1
+        else:
+            for question, answer in pairs:
+                f.write(json.dumps({'question': question, 'answer': answer}, ensure_ascii=False) + '\n')
+                count += 1
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовый импорт/экспорт базы вопросов-ответов')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], dest='file_format')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    db = DBManager()
+    try:
+        if args.command == 'import':
+            stats = db.bulk_import_qa(read_pairs(args.path, args.file_format), chunk_size=args.chunk_size)
+            print(f"Imported: {stats['inserted']} new, {stats['updated']} updated, {stats['skipped']} skipped")
+        else:
+            count = write_pairs(args.path, db.export_qa(chunk_size=args.chunk_size), args.file_format)
+            print(f"Exported {count} QA pairs to {args.path}")
+    finally:
+        db.close_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+from collections import defaultdict
+from typing import Dict, Iterable, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QAIndex:
+    """
+    Инвертированный индекс по нормализованным вопросам QA.
+
+    Хранит два отображения:
+    - token -> id записей, где слово встречается целиком;
+    - prefix -> id записей, где есть слово с таким префиксом.
+
+    Это позволяет отбирать только те записи, у которых есть хотя бы одно
+    слово, совпадающее с входящим или являющееся его префиксом
+    (и наоборот), и не проверять всю таблицу.
+    """
+
+    def __init__(self, min_prefix_length: int = 3):
+        self.min_prefix_length = min_prefix_length
+        self.tokens: Dict[str, Set[int]] = defaultdict(set)
+        self.prefixes: Dict[str, Set[int]] = defaultdict(set)
+        self.size = 0
+
+    def _prefixes(self, word: str) -> Iterable[str]:
+        for length in range(self.min_prefix_length, len(word) + 1):
+            yield word[:length]
+
+    def add(self, qa_id: int, normalized_question: str):
+        """
+        Добавление нормализованного вопроса в индекс
+        """
+        words = (normalized_question or "").split()
+        if not words:
+            return
+
+        for word in words:
+            self.tokens[word].add(qa_id)
+            for prefix in self._prefixes(word):
+                self.prefixes[prefix].add(qa_id)
+
+        self.size += 1
+
+    def build(self, rows: Iterable[Tuple[int, str]]):
+        """
+        Полное построение индекса из пар (id, нормализованный вопрос)
+        """
+        self.tokens.clear()
+        self.prefixes.clear()
+        self.size = 0
+
+        for qa_id, normalized_question in rows:
+            self.add(qa_id, normalized_question)
+
+        logger.info(f"QA index built: {self.size} questions, {len(self.tokens)} tokens")
+
+    def candidates(self, normalized_question: str) -> Set[int]:
+        """
+        Отбор id записей, имеющих общие слова или префиксы с вопросом
+        """
+        result = set()
+
+        for word in normalized_question.split():
+            # Слово целиком совпадает со словом в БД
+            result |= self.tokens.get(word, set())
+
+            # Слово является префиксом слова в БД
+            if len(word) >= self.min_prefix_length:
+                result |= self.prefixes.get(word, set())
+
+            # Слово в БД является префиксом входящего слова
+            for length in range(1, len(word)):
+                result |= self.tokens.get(word[:length], set())
+
+        return result
@@ -0,0 +1,226 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.config import QA_TFIDF_REBUILD_EVERY
+import logging
+
+try:
+    import numpy as np
+    from scipy import sparse
+    TFIDF_AVAILABLE = True
+except ImportError:
+    np = None
+    sparse = None
+    TFIDF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class TfidfMatcher:
+    """
+    Сопоставление вопросов по символьным n-граммам с весами TF-IDF.
+
+    Все вопросы хранятся в разреженной матрице частот n-грамм (строка на
+    вопрос). Оценка входящего вопроса против всей базы - одно произведение
+    разреженной матрицы на вектор. Новый вопрос сразу получает нормированную
+    строку TF-IDF с весами IDF последней перестройки и попадает в небольшую
+    дополнительную матрицу; IDF пересчитывается полной перестройкой после
+    rebuild_every добавлений.
+    """
+
+    def __init__(self, ngram_range: Tuple[int, int] = (3, 4), rebuild_every: int = QA_TFIDF_REBUILD_EVERY):
+        if not TFIDF_AVAILABLE:
+            raise ImportError("TfidfMatcher requires numpy and scipy")
+
+        self.ngram_range = ngram_range
+        self.rebuild_every = rebuild_every
+        self.vocabulary: Dict[str, int] = {}
+        self.ids: List[int] = []
+
+        # Матрица частот n-грамм для уже проиндексированных строк
+        self._counts = None
+        # Буфер строк, добавленных после последней перестройки
+        self._pending_indptr = [0]
+        self._pending_indices: List[int] = []
+        self._pending_data: List[float] = []
+
+        # Нормированная матрица TF-IDF и веса IDF
+        self._matrix = None
+        self._idf = None
+        # Вес IDF для n-грамм, которых не было при последней перестройке
+        self._unseen_idf = 1.0
+        # Нормированные строки, добавленные после перестройки (с замороженным IDF)
+        self._delta_indptr = [0]
+        self._delta_indices: List[int] = []
+        self._delta_data: List[float] = []
+        self._delta_matrix = None
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def _ngrams(self, text: str) -> Counter:
+        padded = f" {text} "
+        grams = Counter()
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                grams[padded[i:i + n]] += 1
+        return grams
+
+    def add(self, qa_id: int, normalized_question: str):
+        """
+        Добавление строки для нового вопроса
+        """
+        grams = self._ngrams(normalized_question or "")
+        if not grams:
+            return
+
+        columns = []
+        for gram, count in grams.items():
+            column = self.vocabulary.setdefault(gram, len(self.vocabulary))
+            columns.append((column, count))
+            self._pending_indices.append(column)
+            self._pending_data.append(count)
+
+        self._pending_indptr.append(len(self._pending_indices))
+        self.ids.append(qa_id)
+
+        if self._matrix is None:
+            # Матрица еще не построена, строка войдет в первую перестройку
+            return
+
+        # Строка сразу доступна для поиска, без перестройки всей матрицы
+        weights = [count * self._column_idf(column) for column, count in columns]
+        norm = float(np.sqrt(sum(weight * weight for weight in weights))) or 1.0
+        for (column, _), weight in zip(columns, weights):
+            self._delta_indices.append(column)
+            self._delta_data.append(weight / norm)
+        self._delta_indptr.append(len(self._delta_indices))
+        self._delta_matrix = None
+
+        if len(self._delta_indptr) - 1 >= self.rebuild_every:
+            self._rebuild()
+
+    def _column_idf(self, column: int) -> float:
+        if column < len(self._idf):
+            return float(self._idf[column])
+        return self._unseen_idf
+
+    def build(self, rows: Iterable[Tuple[int, str]]):
+        """
+        Полное построение матрицы из пар (id, нормализованный вопрос)
+        """
+        self.vocabulary.clear()
+        self.ids = []
+        self._counts = None
+        self._pending_indptr = [0]
+        self._pending_indices = []
+        self._pending_data = []
+        self._matrix = None
+        self._reset_delta()
+
+        for qa_id, normalized_question in rows:
+            self.add(qa_id, normalized_question)
+
+        self._rebuild()
+        logger.info(f"TF-IDF matrix built: {self.size} questions, {len(self.vocabulary)} n-grams")
+
+    def _reset_delta(self):
+        self._delta_indptr = [0]
+        self._delta_indices = []
+        self._delta_data = []
+        self._delta_matrix = None
+
+    def _rebuild(self):
+        """
+        Полная перестройка: новые строки частот добавляются к матрице, IDF пересчитывается
+        """
+        n_columns = len(self.vocabulary)
+        self._reset_delta()
+
+        if len(self._pending_indptr) > 1:
+            pending = sparse.csr_matrix(
+                (
+                    np.asarray(self._pending_data, dtype=np.float32),
+                    np.asarray(self._pending_indices, dtype=np.int32),
+                    np.asarray(self._pending_indptr, dtype=np.int32)
+                ),
+                shape=(len(self._pending_indptr) - 1, n_columns)
+            )
+            if self._counts is None:
+                self._counts = pending
+            else:
+                self._counts.resize((self._counts.shape[0], n_columns))
+                self._counts = sparse.vstack([self._counts, pending], format='csr')
+
+            self._pending_indptr = [0]
+            self._pending_indices = []
+            self._pending_data = []
+
+        if self._counts is None:
+            return
+
+        # Каждая n-грамма встречается в строке не более одного раза,
+        # поэтому документная частота - это число вхождений столбца
+        document_frequency = np.bincount(self._counts.indices, minlength=n_columns)
+        n_rows = self._counts.shape[0]
+        self._idf = (np.log((1 + n_rows) / (1 + document_frequency)) + 1).astype(np.float32)
+        self._unseen_idf = float(np.log(1 + n_rows) + 1)
+
+        weighted = self._counts @ sparse.diags(self._idf)
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        self._matrix = sparse.diags(1 / norms) @ weighted
+        self._matrix = self._matrix.tocsr()
+
+    def _delta(self):
+        if self._delta_matrix is None:
+            self._delta_matrix = sparse.csr_matrix(
+                (
+                    np.asarray(self._delta_data, dtype=np.float32),
+                    np.asarray(self._delta_indices, dtype=np.int32),
+                    np.asarray(self._delta_indptr, dtype=np.int32)
+                ),
+                shape=(len(self._delta_indptr) - 1, len(self.vocabulary))
+            )
+        return self._delta_matrix
+
+    def best_match(self, normalized_question: str) -> Optional[Tuple[int, float]]:
+        """
+        Поиск наиболее похожего вопроса
+
+        :return: (id вопроса, схожесть в процентах) или None
+        """
+        if not self.ids:
+            return None
+
+        if self._matrix is None:
+            self._rebuild()
+
+        columns = []
+        values = []
+        # Неизвестные n-граммы не дают совпадений, но учитываются в норме
+        # вектора вопроса с максимальным весом IDF
+        norm_squared = 0.0
+        for gram, count in self._ngrams(normalized_question or "").items():
+            column = self.vocabulary.get(gram)
+            if column is not None:
+                columns.append(column)
+                values.append(count * self._column_idf(column))
+                norm_squared += values[-1] ** 2
+            else:
+                norm_squared += (count * self._unseen_idf) ** 2
+
+        if not columns:
+            return None
+
+        query = np.zeros(len(self.vocabulary), dtype=np.float32)
+        query[columns] = np.asarray(values, dtype=np.float32) / np.sqrt(norm_squared)
+
+        scores = self._matrix @ query[:self._matrix.shape[1]]
+        if len(self._delta_indptr) > 1:
+            delta = self._delta()
+            scores = np.concatenate([scores, delta @ query[:delta.shape[1]]])
+
+        best_row = int(scores.argmax())
+        return self.ids[best_row], float(scores[best_row]) * 100
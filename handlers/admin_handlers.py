@@ -2,7 +2,9 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from services.google_ai import GoogleAIService
 from services.scraper import Scraper
+from services.crawler import Crawler
 from database.db_manager import DBManager
+from database.async_db_manager import AsyncDBManager
 from services.post_generator import PostGenerator
 import asyncio
 import logging
@@ -10,10 +12,10 @@ import logging
 logger = logging.getLogger(__name__)
 
 class AdminHandler:
-    def __init__(self, ai_service: GoogleAIService, scraper: Scraper):
+    def __init__(self, ai_service: GoogleAIService, scraper: Scraper, crawler: Crawler = None, db: AsyncDBManager = None):
         self.ai_service = ai_service
         self.scraper = scraper
-        self.post_generator = PostGenerator(self.ai_service, self.scraper)
+        self.post_generator = PostGenerator(self.ai_service, self.scraper, crawler, article_store=db)
         self.CHANNEL_ID = "@neurolife_clinic"  # ID канала для публикации
 
     async def generate_post(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -23,12 +25,20 @@ class AdminHandler:
         if update.effective_user.id not in context.bot_data.get('admin_ids', []):
             return
 
+        # /generate oneshot - генерация одним запросом к модели
+        mode = None
+        if context.args and context.args[0].lower() in ('oneshot', 'one_shot'):
+            mode = 'one_shot'
+        elif context.args and context.args[0].lower() in ('twostage', 'two_stage'):
+            mode = 'two_stage'
+
         status_message = await update.message.reply_text("🔄 Генерирую пост...")
 
         try:
-            post = await self.post_generator.generate_ai_post(
+            post, article_id = await self.post_generator.generate_ai_post_draft(
                 category="parenting",
-                post_type="advice"
+                post_type="advice",
+                mode=mode
             )
 
             if post:
@@ -38,6 +48,8 @@ class AdminHandler:
                 ]]
                 
                 context.user_data['current_post'] = post  # Сохраняем текущий пост
+                # Статья отмечается использованной при публикации, а не при генерации
+                context.user_data['current_article_id'] = article_id
 
                 await update.message.reply_text(
                     f"🤖 Новый пост:\n\n{post}",
@@ -111,6 +123,10 @@ class AdminHandler:
                 )
                 await query.message.reply_text("✅ Пост опубликован в канале")
                 
+                article_id = context.user_data.pop('current_article_id', None)
+                if article_id:
+                    await self.post_generator.mark_article_used(article_id)
+                
                 # Очищаем текущий пост
                 context.user_data['current_post'] = None
             except Exception as e:
@@ -1,11 +1,27 @@
 from telegram import Update
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
-from services.google_ai import GoogleAIService
-from database.db_manager import DBManager
-from config.config import ADMIN_IDS
+from services.google_ai import (
+    GoogleAIService, QuestionRejected, BUDGET_EXCEEDED_TEXT, OVERLOADED_TEXT, UNAVAILABLE_TEXT
+)
+from services.llm_scheduler import LLMOverloaded
+from services.resilience import CircuitOpen
+from services.single_flight import SingleFlight
+from services.token_accounting import TokenBudgetExceeded
+from database.async_db_manager import AsyncDBManager
+from config.config import ADMIN_IDS, LLM_STREAMING, STREAM_EDIT_INTERVAL
+from utils.content_filter import get_content_filter
+from utils.text_processor import normalize_question
+import asyncio
 import time
+import logging
 from collections import defaultdict
 
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текста сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
 class RateLimiter:
     def __init__(self, max_requests=10, time_window=60):
         self.request_counts = defaultdict(list)
@@ -25,10 +41,13 @@ class RateLimiter:
         return True
 
 class UserHandler:
-    def __init__(self):
-        self.ai_service = GoogleAIService()
-        self.db = DBManager()
+    def __init__(self, ai_service: GoogleAIService = None, db: AsyncDBManager = None):
+        # Общий экземпляр сервиса, чтобы лимит одновременных запросов был один на бота
+        self.ai_service = ai_service or GoogleAIService()
+        self.db = db or AsyncDBManager()
         self.rate_limiter = RateLimiter()
+        # Одинаковые вопросы, заданные одновременно, уходят в модель один раз
+        self.single_flight = SingleFlight()
 
     async def handle_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
@@ -51,26 +70,121 @@ class UserHandler:
             return
 
         # Проверяем, есть ли ответ в базе данных
-        qa = self.db.get_qa(question)
+        qa = await self.db.get_qa(question)
         if qa:
             await update.message.reply_text(qa.answer)
             return
 
-        # Если ответа нет в базе, генерируем новый с помощью AI
-        answer = self.ai_service.answer_question(question, None)
+        # Пока модель недоступна, отвечаем только из базы; поиск по ней уже выполнен выше
+        if not self.ai_service.is_available():
+            await update.message.reply_text(UNAVAILABLE_TEXT)
+            return
+        
+        key = normalize_question(question)
         
-        # Сохраняем новый вопрос и ответ
-        self.db.add_qa(question, answer)
+        # Первый из одинаковых вопросов получает ответ потоком, остальные ждут готовый текст
+        if LLM_STREAMING and not self.single_flight.in_flight(key):
+            await self.single_flight.do(key, lambda: self._stream_answer_and_store(update, question, user_id))
+            return
+        
+        # Если ответа нет в базе, генерируем новый с помощью AI
+        answer = await self.single_flight.do(
+            key,
+            lambda: self._answer_and_store(question, user_id)
+        )
         
         await update.message.reply_text(answer)
 
+    async def _answer_from_cache_only(self, question):
+        """
+        Ответ из базы, когда модель отклонила запрос предохранителем. Порог схожести
+        обычный: за время ожидания ответ мог сохранить другой запрос
+        """
+        qa = await self.db.get_qa(question)
+        return qa.answer if qa else UNAVAILABLE_TEXT
+
+    async def _answer_and_store(self, question, user_id=None):
+        try:
+            answer, ok = await self.ai_service.try_answer_question(question, user_id)
+        except CircuitOpen:
+            return await self._answer_from_cache_only(question)
+        
+        # Сохраняем новый вопрос и ответ, сообщения об ошибках в базу не попадают
+        if ok:
+            await self.db.add_qa(question, answer)
+        
+        return answer
+
+    async def _stream_answer_and_store(self, update, question, user_id=None):
+        """
+        Ответ с потоковой выдачей: сначала заглушка, затем правки сообщения
+        не чаще STREAM_EDIT_INTERVAL. В базу пишется только полный ответ.
+        """
+        message = await update.message.reply_text("✍️ Готовлю ответ...")
+        answer = ""
+        sent_text = ""
+        next_edit_at = 0
+        
+        try:
+            async for chunk in self.ai_service.stream_answer(question, user_id):
+                answer += chunk
+                now = time.monotonic()
+                if now >= next_edit_at:
+                    delay = await self._edit_stream_message(message, answer, sent_text)
+                    if not delay:
+                        sent_text = answer
+                    next_edit_at = now + max(STREAM_EDIT_INTERVAL, delay)
+        except QuestionRejected as e:
+            # Вопрос отклонен проверками до обращения к модели
+            await self._edit_stream_message(message, str(e), sent_text)
+            return str(e)
+        except TokenBudgetExceeded:
+            await self._edit_stream_message(message, BUDGET_EXCEEDED_TEXT, sent_text)
+            return BUDGET_EXCEEDED_TEXT
+        except CircuitOpen:
+            # Предохранитель разомкнут или занят пробным запросом
+            cached_text = await self._answer_from_cache_only(question)
+            await self._edit_stream_message(message, cached_text, sent_text)
+            return cached_text
+        except LLMOverloaded:
+            await self._edit_stream_message(message, OVERLOADED_TEXT, sent_text)
+            return OVERLOADED_TEXT
+        except Exception as e:
+            logger.error(f"Ошибка потоковой генерации ответа: {e}", exc_info=True)
+            error_text = "Извините, произошла ошибка при генерации ответа."
+            await self._edit_stream_message(message, error_text, sent_text)
+            return error_text
+        
+        # Финальная правка обязательна, при ограничении Telegram ждем и повторяем
+        delay = await self._edit_stream_message(message, answer, sent_text)
+        if delay:
+            await asyncio.sleep(delay)
+            await self._edit_stream_message(message, answer, sent_text)
+        
+        if answer:
+            await self.db.add_qa(question, answer)
+        
+        return answer
+
+    async def _edit_stream_message(self, message, text, sent_text):
+        """
+        Правка сообщения с ответом, возвращает паузу, запрошенную Telegram
+        """
+        text = text[:MAX_MESSAGE_LENGTH]
+        if not text.strip() or text == sent_text[:MAX_MESSAGE_LENGTH]:
+            return 0
+        
+        try:
+            await message.edit_text(text)
+        except RetryAfter as e:
+            logger.warning(f"Telegram ограничил правки сообщения на {e.retry_after} сек")
+            return float(e.retry_after)
+        except BadRequest as e:
+            # Например, "Message is not modified"
+            logger.debug(f"Не удалось изменить сообщение: {e}")
+        
+        return 0
+
     def contains_dangerous_content(self, text):
-        # Расширенный список запрещенных слов
-        forbidden_words = [
-            'hack', 'exploit', 'injection', 'malware', 
-            'вирус', 'атака', 'взлом', 'шпионаж', 
-            'паролей', 'данные', 'кража', 'trojans'
-        ]
-        
-        # Проверка на наличие запрещенных слов с учетом регистра
-        return any(word.lower() in text.lower() for word in forbidden_words)
\ No newline at end of file
+        # Общий фильтр: один проход по тексту для всего списка запрещенных слов
+        return get_content_filter().matches(text, 'dangerous')
\ No newline at end of file
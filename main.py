@@ -8,6 +8,8 @@ from handlers.admin_handlers import AdminHandler
 from handlers.user_handlers import UserHandler
 from services.google_ai import GoogleAIService
 from services.scraper import Scraper
+from services.crawler import Crawler
+from database.async_db_manager import AsyncDBManager
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -51,6 +53,9 @@ class TelegramBot:
         # Initialize services that will be passed to handlers
         self.ai_service = GoogleAIService()
         self.scraper = Scraper()
+        # Общая БД: вопросы-ответы и хранилище статей
+        self.db = AsyncDBManager()
+        self.crawler = Crawler(self.scraper, store=self.db)
 
     async def setup(self):
         """Initialize bot and handlers"""
@@ -60,9 +65,11 @@ class TelegramBot:
         # Initialize handlers with required services
         admin_handler = AdminHandler(
             ai_service=self.ai_service,
-            scraper=self.scraper
+            scraper=self.scraper,
+            crawler=self.crawler,
+            db=self.db
         )
-        user_handler = UserHandler()
+        user_handler = UserHandler(ai_service=self.ai_service, db=self.db)
 
         # Register command handlers
         self.application.add_handler(CommandHandler("generate", admin_handler.generate_post))
@@ -90,6 +97,8 @@ class TelegramBot:
         """Start the bot"""
         logger.info('Starting bot...')
         await self.setup()
+        await self.scraper.start()
+        self.crawler.start()
         await self.application.initialize()
         await self.application.start()
         await self.application.updater.start_polling(drop_pending_updates=True)
@@ -103,6 +112,9 @@ class TelegramBot:
             await self.application.updater.stop()
             await self.application.stop()
             await self.application.shutdown()
+            await self.crawler.stop()
+            await self.scraper.close()
+            await self.db.close_connection()
 
 def run_bot():
     """Run the bot with proper async handling"""
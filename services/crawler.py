@@ -0,0 +1,105 @@
+import asyncio
+import random
+from typing import Dict, List, Optional
+from config.config import (
+    MedicalSource, MEDICAL_SOURCES,
+    SCRAPING_INTERVAL, SCRAPING_JITTER, CONCURRENT_REQUESTS
+)
+from database.async_db_manager import AsyncDBManager
+from services.scraper import Scraper, matches_category
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Crawler:
+    """
+    Фоновый обход источников на цикле событий бота.
+
+    Раз в interval секунд (со случайным разбросом jitter) обновляет все
+    источники, одновременно обрабатывая не более concurrency из них.
+    Генерация постов читает уже собранные материалы и не ждет скрапинга.
+    Если задано хранилище, новые статьи сохраняются в БД с дедупликацией.
+    """
+
+    def __init__(
+        self,
+        scraper: Scraper,
+        store: Optional[AsyncDBManager] = None,
+        sources: Optional[List[MedicalSource]] = None,
+        interval: float = SCRAPING_INTERVAL,
+        jitter: float = SCRAPING_JITTER,
+        concurrency: int = CONCURRENT_REQUESTS
+    ):
+        self.scraper = scraper
+        self.store = store
+        self.sources = sources if sources is not None else MEDICAL_SOURCES
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        # Последний успешный результат по каждому источнику
+        self._articles: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'runs': 0, 'scraped': 0, 'failed': 0, 'stored': 0}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Crawler started: {len(self.sources)} sources every {self.interval} s")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _next_delay(self) -> float:
+        return max(0.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.crawl_once()
+            except Exception as e:
+                logger.error(f"Ошибка фонового обхода источников: {e}", exc_info=True)
+            await asyncio.sleep(self._next_delay())
+
+    async def crawl_once(self) -> int:
+        """
+        Однократное обновление всех источников, возвращает число успешных
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def crawl(source: MedicalSource) -> Optional[Dict]:
+            async with semaphore:
+                return await self.scraper.scrape_with_retry(source)
+
+        results = await asyncio.gather(*(crawl(source) for source in self.sources), return_exceptions=True)
+
+        scraped = []
+        for source, result in zip(self.sources, results):
+            if isinstance(result, dict):
+                self._articles[source.name] = result
+                scraped.append(result)
+            else:
+                self.stats['failed'] += 1
+
+        if self.store and scraped:
+            self.stats['stored'] += await self.store.save_articles(scraped)
+
+        self.stats['runs'] += 1
+        self.stats['scraped'] += len(scraped)
+        logger.info(f"Обход источников завершен: {len(scraped)} из {len(self.sources)} успешно")
+        return len(scraped)
+
+    def get_articles(self, category: str, language: str = 'ru') -> List[Dict]:
+        """
+        Собранные материалы для категории и языка
+        """
+        return [
+            article for article in self._articles.values()
+            if matches_category(article['category'], category) and article['language'] == language
+        ]
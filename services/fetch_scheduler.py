@@ -0,0 +1,168 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from config.config import (
+    CONCURRENT_REQUESTS, SCRAPER_PER_HOST_CONCURRENCY,
+    SCRAPER_HOST_MIN_DELAY, SCRAPER_MAX_BACKOFF
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FetchThrottled(Exception):
+    """
+    Сервер попросил снизить нагрузку (429 / 503)
+    """
+
+    def __init__(self, url: str, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"Статус {status} для {url}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Значение заголовка Retry-After в секундах: число секунд или HTTP-дата
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class _HostState:
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # Не раньше этого момента (time.monotonic) можно начать следующий запрос
+        self.next_start = 0.0
+
+
+class FetchScheduler:
+    """
+    Планировщик HTTP-запросов скрапера.
+
+    Ограничивает число одновременных запросов к одному хосту и выдерживает
+    минимальный интервал между началами запросов к нему. Общий семафор
+    ограничивает число запросов ко всем хостам; он занимается только после
+    ожидания очереди хоста, чтобы медленный хост не держал общие слоты.
+    """
+
+    def __init__(
+        self,
+        global_limit: int = CONCURRENT_REQUESTS,
+        per_host_limit: int = SCRAPER_PER_HOST_CONCURRENCY,
+        min_delay: float = SCRAPER_HOST_MIN_DELAY,
+        max_backoff: float = SCRAPER_MAX_BACKOFF
+    ):
+        self.global_limit = global_limit
+        self.per_host_limit = per_host_limit
+        self.min_delay = min_delay
+        self.max_backoff = max_backoff
+        self._global: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, _HostState] = {}
+        self._metrics = defaultdict(lambda: {
+            'fetches': 0, 'throttled': 0,
+            'queue_wait_total': 0.0, 'queue_wait_max': 0.0,
+            'fetch_time_total': 0.0, 'fetch_time_max': 0.0
+        })
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).hostname or ''
+
+    def _host_state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.per_host_limit)
+        return state
+
+    def _global_semaphore(self) -> asyncio.Semaphore:
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_limit)
+        return self._global
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        Разрешение на один запрос к url с учетом ограничений хоста и общего лимита
+        """
+        host = self.host_of(url)
+        state = self._host_state(host)
+        metrics = self._metrics[host]
+        queued_at = time.monotonic()
+
+        async with state.semaphore:
+            # Резервируем момент начала, следующий запрос к хосту - не раньше min_delay
+            now = time.monotonic()
+            start_at = max(now, state.next_start)
+            state.next_start = start_at + self.min_delay
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+
+            async with self._global_semaphore():
+                started_at = time.monotonic()
+                queue_wait = started_at - queued_at
+                metrics['queue_wait_total'] += queue_wait
+                metrics['queue_wait_max'] = max(metrics['queue_wait_max'], queue_wait)
+                try:
+                    yield
+                finally:
+                    fetch_time = time.monotonic() - started_at
+                    metrics['fetches'] += 1
+                    metrics['fetch_time_total'] += fetch_time
+                    metrics['fetch_time_max'] = max(metrics['fetch_time_max'], fetch_time)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Пауза перед повтором: Retry-After сервера без изменений или экспоненциальная
+        со случайным разбросом. Слишком долгий Retry-After (см. should_give_up) не сокращается
+        """
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_backoff, 2 ** attempt))
+
+    def should_give_up(self, retry_after: Optional[float]) -> bool:
+        """
+        Сервер просит ждать дольше max_backoff: повторять в этом обходе бессмысленно
+        """
+        return retry_after is not None and retry_after > self.max_backoff
+
+    def penalize(self, url: str, delay: float):
+        """
+        Отложить все следующие запросы к хосту url на delay секунд
+        """
+        host = self.host_of(url)
+        state = self._host_state(host)
+        state.next_start = max(state.next_start, time.monotonic() + delay)
+        self._metrics[host]['throttled'] += 1
+        logger.warning(f"Запросы к {host} приостановлены на {delay:.1f} с")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Метрики по хостам: число запросов, ожидание в очереди и время загрузки
+        """
+        result = {}
+        for host, metrics in self._metrics.items():
+            fetches = metrics['fetches'] or 1
+            result[host] = {
+                **metrics,
+                'queue_wait_avg': metrics['queue_wait_total'] / fetches,
+                'fetch_time_avg': metrics['fetch_time_total'] / fetches
+            }
+        return result
@@ -1,49 +1,196 @@
 import asyncio
-import google.generativeai as genai
-from config.config import GOOGLE_AI_API_KEY
+from config.config import LLM_TIMEOUT, LLM_CACHE_ENABLED, LLM_HEDGING
+from services.llm_backends import LLMBackend, create_backend
+from services.llm_scheduler import LLMScheduler, LLMOverloaded, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from services.resilience import CircuitBreaker, CircuitOpen, Hedger
+from services.response_cache import ResponseCache
+from services.token_accounting import TokenAccountant, TokenBudgetExceeded, TokenUsage, estimate_tokens
+from utils.content_filter import get_content_filter
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Сообщения пользователю при отказе в ответе, общие для сервиса и обработчиков
+BUDGET_EXCEEDED_TEXT = "Извините, лимит запросов исчерпан. Попробуйте позже."
+OVERLOADED_TEXT = "Сейчас слишком много запросов. Попробуйте через минуту."
+UNAVAILABLE_TEXT = "Сервис ответов временно недоступен. Попробуйте позже."
+
+
+class QuestionRejected(Exception):
+    """Вопрос отклонен проверками до обращения к модели, текст - сообщение для пользователя"""
+
 
 class GoogleAIService:
-    def __init__(self):
-        genai.configure(api_key=GOOGLE_AI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
+    def __init__(self, backend: LLMBackend = None):
+        # Бэкенд модели: Gemini или локальная замена (LLM_BACKEND)
+        self.backend = backend or create_backend()
+        self.model_name = self.backend.model_name
+        # Очередь с приоритетами и лимитами запросов/токенов в минуту
+        self.scheduler = LLMScheduler()
+        # Кэш ответов для генерации постов
+        self.cache = ResponseCache() if LLM_CACHE_ENABLED else None
+        # Учет токенов и бюджеты
+        self.accountant = TokenAccountant()
+        # Предохранитель от серии сбоев и дублирование медленных запросов
+        self.breaker = CircuitBreaker()
+        self.hedger = Hedger()
+
+    def is_available(self):
+        """Можно ли сейчас обращаться к модели (предохранитель не разомкнут)"""
+        return not self.breaker.is_open
+
+    def resilience_stats(self):
+        return {
+            'breaker_state': self.breaker.state,
+            'breaker': dict(self.breaker.stats),
+            'hedging': dict(self.hedger.stats),
+            'latency_p50': self.hedger.latency.percentile(50),
+            'latency_p95': self.hedger.latency.percentile(95),
+            'scheduler': dict(self.scheduler.stats),
+        }
+
+    async def _call_backend(self, prompt, kind, user_id, priority, estimated_tokens):
+        # Асинхронный вызов SDK не блокирует цикл событий бота
+        call = lambda: asyncio.wait_for(self.backend.generate(prompt), timeout=LLM_TIMEOUT)
+        
+        async with self.scheduler.slot(priority, estimated_tokens):
+            # Дублируется только сам вызов модели после получения слота, ожидание в очереди
+            # не попадает в задержки. Дублируются только интерактивные запросы
+            if not (LLM_HEDGING and priority == PRIORITY_INTERACTIVE):
+                return await call()
+            return await self.hedger.run(
+                call,
+                allow_hedge=lambda: self._reserve_hedge(estimated_tokens),
+                # Отмененный вызов тоже расходует токены, учитываем хотя бы оценку промпта
+                on_abandoned=lambda: self.accountant.record(kind, TokenUsage(prompt_tokens=estimated_tokens), user_id)
+            )
+
+    def _reserve_hedge(self, estimated_tokens):
+        """
+        Разрешение на дублирующий запрос: не дублируем, пока в очереди кто-то ждет
+        """
+        if self.scheduler.queue_depth > 0:
+            return False
+        self.scheduler.record_extra_call(estimated_tokens)
+        return True
 
-    async def generate_post(self, scraped_data):
+    async def _generate(self, prompt, kind, user_id=None, priority=PRIORITY_INTERACTIVE):
+        estimated_tokens = estimate_tokens(prompt)
+        self.accountant.check(user_id, estimated_tokens)
+        
+        if not self.breaker.allow_request():
+            raise CircuitOpen("LLM circuit breaker is open")
+        
+        succeeded = False
+        try:
+            result = await self._call_backend(prompt, kind, user_id, priority, estimated_tokens)
+            succeeded = True
+        except LLMOverloaded:
+            # Отказ собственной очереди - не сбой модели
+            raise
+        except Exception as e:
+            # Заблокированный ответ или ошибка в аргументах не говорят о недоступности модели
+            if self.backend.is_provider_failure(e):
+                self.breaker.record_failure()
+            raise
+        finally:
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.release_probe()
+        
+        self.scheduler.record_tokens(result.usage.total_tokens - estimated_tokens)
+        self.accountant.record(kind, result.usage, user_id)
+        return result.text
+
+    async def _generate_stream(self, prompt, kind, user_id=None, priority=PRIORITY_INTERACTIVE):
+        estimated_tokens = estimate_tokens(prompt)
+        self.accountant.check(user_id, estimated_tokens)
+        
+        if not self.breaker.allow_request():
+            raise CircuitOpen("LLM circuit breaker is open")
+        
+        succeeded = False
+        try:
+            async with self.scheduler.slot(priority, estimated_tokens):
+                chunks = self.backend.stream(prompt).__aiter__()
+                while True:
+                    # Таймаут на каждый фрагмент, а не на весь ответ целиком
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=LLM_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.usage:
+                        self.scheduler.record_tokens(chunk.usage.total_tokens - estimated_tokens)
+                        self.accountant.record(kind, chunk.usage, user_id)
+                    if chunk.text:
+                        yield chunk.text
+            succeeded = True
+        except LLMOverloaded:
+            raise
+        except Exception as e:
+            if self.backend.is_provider_failure(e):
+                self.breaker.record_failure()
+            raise
+        finally:
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.release_probe()
+
+    async def generate_post(self, scraped_data, use_cache=False):
+        """
+        Генерация текста поста. use_cache - брать ответ из кэша; имеет смысл только
+        для промптов по конкретной статье, иначе одинаковый промпт дает одинаковый пост
+        """
         prompt = f"""
         На основе следующей информации создайте интересный пост для Telegram:
         {scraped_data}
         
         Пост должен быть информативным, легко читаемым и привлекательным для аудитории.
         """
-        # Запускаем синхронный метод в отдельном потоке
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
-            lambda: self.model.generate_content(prompt)
-        )
-        return result.text
+        if not (self.cache and use_cache):
+            return await self._generate(prompt, 'generate_post', priority=PRIORITY_BACKGROUND)
+        
+        key = ResponseCache.make_key(self.model_name, prompt)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            logger.info(f"LLM cache hit, stats: {self.cache.stats}")
+            return cached
+        
+        result = await self._generate(prompt, 'generate_post', priority=PRIORITY_BACKGROUND)
+        await self.cache.aset(key, result)
+        return result
 
     def _is_toxic_content(self, text):
-
-        toxic_keywords = [
-            'hack', 'exploit', 'injection', 'malware', 
-            'вирус', 'атака', 'взлом', 'шпионаж', 
-            'паролей', 'данные', 'кража', 'trojans',
-            'насилие', 'оскорбление', 'дискриминация'
-        ]
-        
-        return any(keyword.lower() in text.lower() for keyword in toxic_keywords)
+        return get_content_filter().matches(text, 'toxic')
 
     def _count_tokens(self, text):
-        return len(text.split())
+        return estimate_tokens(text)
 
-    def _generate_answer(self, question):
+    async def _generate_answer(self, question, user_id=None):
+        """
+        Генерация ответа, возвращает (текст, успех). При ошибке текст - сообщение для пользователя,
+        CircuitOpen пробрасывается
+        """
         try:
-            result = self.model.generate_content(question)
-            return result.text
+            return await self._generate(question, 'answer_question', user_id), True
+        except TokenBudgetExceeded:
+            return BUDGET_EXCEEDED_TEXT, False
+        except LLMOverloaded:
+            return OVERLOADED_TEXT, False
+        except CircuitOpen:
+            # Решение об ответе из базы принимает вызывающий
+            raise
+        except asyncio.TimeoutError:
+            return "Извините, ответ не был получен вовремя. Попробуйте позже.", False
         except Exception as e:
-            return f"Извините, произошла ошибка при генерации ответа: {str(e)}"
+            return f"Извините, произошла ошибка при генерации ответа: {str(e)}", False
 
-    def answer_question(self, question, context):
+    def _check_question(self, question):
+        """
+        Проверка вопроса перед генерацией, возвращает текст отказа или None
+        """
         # Проверка токсичности контента перед генерацией
         if self._is_toxic_content(question):
             return "Извините, я не могу обработать этот запрос."
@@ -53,5 +200,36 @@ class GoogleAIService:
         if self._count_tokens(question) > MAX_TOKENS:
             return "Слишком длинный запрос."
         
+        return None
+
+    async def stream_answer(self, question, user_id=None):
+        """
+        Потоковая генерация ответа: фрагменты текста по мере готовности.
+        QuestionRejected, ошибки модели, TokenBudgetExceeded, LLMOverloaded и CircuitOpen
+        пробрасываются вызывающему.
+        """
+        rejection = self._check_question(question)
+        if rejection:
+            raise QuestionRejected(rejection)
+        
+        async for chunk in self._generate_stream(question, 'answer_question', user_id):
+            yield chunk
+
+    async def try_answer_question(self, question, user_id=None):
+        """
+        Ответ на вопрос с признаком успеха: (текст, True) или (сообщение об отказе/ошибке, False).
+        CircuitOpen пробрасывается, чтобы вызывающий мог ответить из базы.
+        """
+        rejection = self._check_question(question)
+        if rejection:
+            return rejection, False
+        
         # Основная логика генерации ответа
-        return self._generate_answer(question)
+        return await self._generate_answer(question, user_id)
+
+    async def answer_question(self, question, context, user_id=None):
+        try:
+            answer, _ = await self.try_answer_question(question, user_id)
+        except CircuitOpen:
+            return UNAVAILABLE_TEXT
+        return answer
@@ -0,0 +1,76 @@
+import asyncio
+import socket
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import logging
+
+from config.config import SCRAPER_HOST_TTL, SCRAPER_HOST_NEGATIVE_TTL
+from services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class HostHealthCache:
+    """
+    Кэш доступности хостов для предварительной проверки перед скрапингом.
+
+    Имя разрешается через loop.getaddrinfo (в пуле потоков цикла событий),
+    результат хранится с разным сроком жизни для доступных и недоступных
+    хостов. Одновременные проверки одного хоста выполняют одно разрешение.
+    """
+
+    def __init__(self, ttl: float = SCRAPER_HOST_TTL, negative_ttl: float = SCRAPER_HOST_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # host -> (доступен, момент истечения записи)
+        self._entries: Dict[str, Tuple[bool, float]] = {}
+        self._lookups = SingleFlight()
+        self.stats = {'hits': 0, 'lookups': 0, 'failures': 0}
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).hostname or ''
+
+    def cached(self, host: str) -> Optional[bool]:
+        """
+        Результат из кэша без обращения к резолверу или None, если записи нет
+        """
+        entry = self._entries.get(host)
+        if entry is None:
+            return None
+        available, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[host]
+            return None
+        return available
+
+    async def is_available(self, url: str) -> bool:
+        host = self.host_of(url)
+        if not host:
+            return False
+
+        available = self.cached(host)
+        if available is not None:
+            self.stats['hits'] += 1
+            return available
+
+        return await self._lookups.do(host, lambda: self._resolve(host))
+
+    async def _resolve(self, host: str) -> bool:
+        self.stats['lookups'] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            available = True
+        except (socket.gaierror, UnicodeError) as e:
+            logger.error(f"Хост {host} недоступен: {e}")
+            self.stats['failures'] += 1
+            available = False
+
+        ttl = self.ttl if available else self.negative_ttl
+        self._entries[host] = (available, time.monotonic() + ttl)
+        return available
+
+    def invalidate(self, url: str):
+        self._entries.pop(self.host_of(url), None)
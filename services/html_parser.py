@@ -0,0 +1,212 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Union
+from config.config import HTML_PARSER_BACKEND, HTML_PARSER_WORKERS
+import logging
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    try:
+        # Старые версии selectolax без движка lexbor
+        from selectolax.parser import HTMLParser
+        SELECTOLAX_AVAILABLE = True
+    except ImportError:
+        HTMLParser = None
+        SELECTOLAX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+Selectors = Dict[str, Union[str, List[str]]]
+
+# Минимальная длина текста, при которой элемент считается найденным контентом
+MIN_CONTENT_LENGTH = 50
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """
+    Выбор доступного бэкенда: html.parser, lxml или selectolax
+    """
+    backend = backend or HTML_PARSER_BACKEND
+    if backend == 'lxml' and not LXML_AVAILABLE:
+        logger.warning("lxml is not installed, falling back to html.parser")
+        return 'html.parser'
+    if backend == 'selectolax' and not SELECTOLAX_AVAILABLE:
+        logger.warning("selectolax is not installed, falling back to html.parser")
+        return 'html.parser'
+    if backend not in ('html.parser', 'lxml', 'selectolax'):
+        logger.warning(f"Unknown HTML parser backend '{backend}', falling back to html.parser")
+        return 'html.parser'
+    return backend
+
+
+def _select_texts(document, backend: str, selector: str):
+    """
+    Тексты элементов по CSS-селектору в порядке документа
+    """
+    if backend == 'selectolax':
+        for node in document.css(selector):
+            yield node.text(deep=True, separator='', strip=True)
+    else:
+        for element in document.select(selector):
+            yield element.get_text(strip=True)
+
+
+def extract_content(html: str, selectors: Selectors, backend: str = 'html.parser') -> Dict[str, Optional[str]]:
+    """
+    Разбор страницы и извлечение полей по селекторам источника.
+
+    Для каждого селектора поля берется первый элемент с текстом длиннее
+    MIN_CONTENT_LENGTH; если подходят несколько селекторов, остается результат
+    последнего. Функция не зависит от состояния процесса и выполняется
+    в пуле процессов.
+    """
+    if backend == 'selectolax':
+        document = HTMLParser(html)
+    else:
+        document = BeautifulSoup(html, backend)
+
+    result = {'title': None, 'content': None, 'article': None}
+
+    for field, field_selectors in selectors.items():
+        if isinstance(field_selectors, str):
+            field_selectors = [field_selectors]
+
+        for selector in field_selectors:
+            try:
+                for text in _select_texts(document, backend, selector):
+                    if text and len(text) > MIN_CONTENT_LENGTH:
+                        result[field] = text
+                        break
+            except Exception as e:
+                logger.warning(f"Ошибка при поиске {field} с селектором {selector}: {str(e)}")
+
+    return result
+
+
+def extract_articles(html: str, url: str, max_articles: int = 10, backend: str = 'html.parser') -> List[Dict]:
+    """
+    Извлечение списка статей со страницы-листинга
+    """
+    # Поиск относительно найденного блока требует BeautifulSoup
+    soup = BeautifulSoup(html, 'lxml' if backend != 'html.parser' and LXML_AVAILABLE else 'html.parser')
+    articles = []
+
+    # Расширенный список селекторов для поиска статей
+    article_selectors = [
+        '.post', 'article', '.news-item', '.article-item',
+        '.blog-post', '.content-block', '.entry',
+        '.article', '.post-item', '.card'
+    ]
+
+    for selector in article_selectors:
+        items = soup.select(selector)
+        if items:
+            for item in items[:max_articles]:
+                try:
+                    # Более гибкий поиск заголовка и контента
+                    title = (
+                        item.select_one('h1, h2, h3, .title, .headline, a.title') or
+                        item.select_one('.post-title, .entry-title')
+                    )
+
+                    content = (
+                        item.select_one('p, .content, .text, .excerpt, .summary') or
+                        item.select_one('.post-content, .entry-content')
+                    )
+
+                    # Поиск ссылки на полную статью
+                    link = (
+                        item.select_one('a.read-more, a.more-link, a.post-link') or
+                        (title.find('a') if title and title.find('a') else None)
+                    )
+
+                    if title and content:
+                        article_data = {
+                            'title': title.get_text(strip=True),
+                            'content': content.get_text(strip=True)[:500],  # Ограничиваем длину контента
+                            'url': link['href'] if link and link.has_attr('href') else url
+                        }
+
+                        # Добавляем дополнительные метаданные, если возможно
+                        date = item.select_one('time, .date, .post-date')
+                        if date:
+                            article_data['date'] = date.get_text(strip=True)
+
+                        articles.append(article_data)
+
+                        if len(articles) >= max_articles:
+                            break
+                except Exception as e:
+                    logger.error(f"Ошибка при парсинге статьи: {str(e)}")
+                    continue
+
+            break  # Если нашли статьи по одному из селекторов, прекращаем поиск
+
+    return articles
+
+
+class HtmlParserPool:
+    """
+    Разбор HTML вне цикла событий.
+
+    Разбор и извлечение выполняются в пуле процессов, в основной процесс
+    возвращается только небольшой словарь с результатом. При workers=0
+    используется поток, что удобно для отладки.
+    """
+
+    def __init__(self, workers: int = HTML_PARSER_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers > 0 and self._executor is None:
+            # spawn, а не fork: к этому моменту в процессе уже есть потоки пулов БД
+            # и обработчики логов, чьи захваченные блокировки унаследовал бы потомок
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    async def _run(self, func, *args):
+        executor = self._get_executor()
+        if executor is None:
+            return await asyncio.to_thread(func, *args)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # Процесс пула завершился аварийно (нехватка памяти, сбой в lxml/selectolax):
+            # сломанный пул больше не принимает задачи, создаем новый и повторяем один раз
+            logger.warning("Пул разбора HTML сломан, пересоздаем")
+            self._reset_executor(executor)
+            executor = self._get_executor()
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    def _reset_executor(self, executor: ProcessPoolExecutor):
+        # Пул мог быть уже пересоздан параллельной задачей
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def extract_content(self, html: str, selectors: Selectors, backend: Optional[str] = None) -> Dict[str, Optional[str]]:
+        return await self._run(extract_content, html, selectors, resolve_backend(backend))
+
+    async def extract_articles(self, html: str, url: str, max_articles: int = 10, backend: Optional[str] = None) -> List[Dict]:
+        return await self._run(extract_articles, html, url, max_articles, resolve_backend(backend))
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,146 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from config.config import HTTP_CACHE_PATH, HTTP_CACHE_MAX_BYTES
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedPage:
+    url: str
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    # Лимит размера, по которому тело было обрезано; None - страница целиком
+    truncated_at: Optional[int] = None
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now or time.time()) - self.fetched_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """
+        Заголовки условного запроса: сервер ответит 304, если страница не менялась
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    Дисковый кэш HTML-страниц источников, адресуемый URL.
+
+    Вместе с телом хранятся валидаторы ETag / Last-Modified для условных
+    запросов. Тело, обрезанное по лимиту размера, хранится с этим лимитом
+    и годится только для запроса с тем же лимитом. Размер кэша ограничен
+    max_bytes: при превышении удаляются давно не использованные страницы.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.stats = {'fresh_hits': 0, 'revalidated': 0, 'misses': 0, 'evictions': 0}
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            "url TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "size INTEGER NOT NULL, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(http_cache)")}
+        if 'truncated_at' not in columns:
+            self._conn.execute("ALTER TABLE http_cache ADD COLUMN truncated_at INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_http_cache_accessed_at ON http_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at, truncated_at FROM http_cache WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+            if not row:
+                return None
+
+            self._conn.execute("UPDATE http_cache SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+            return CachedPage(url, *row)
+
+    def store(
+        self,
+        url: str,
+        body: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        truncated_at: Optional[int] = None
+    ):
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(url, body, etag, last_modified, size, fetched_at, accessed_at, truncated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, len(body.encode('utf-8')), now, now, truncated_at)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """
+        Отметка успешной перепроверки (ответ 304): страница снова свежая
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE http_cache SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                (now, now, url)
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        victims = []
+        for url, size in self._conn.execute("SELECT url, size FROM http_cache ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            victims.append((url,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM http_cache WHERE url = ?", victims)
+        self.stats['evictions'] += len(victims)
+        logger.info(f"HTTP cache evicted {len(victims)} least recently used pages")
+
+    async def aget(self, url: str) -> Optional[CachedPage]:
+        return await asyncio.to_thread(self.get, url)
+
+    async def astore(
+        self,
+        url: str,
+        body: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        truncated_at: Optional[int] = None
+    ):
+        await asyncio.to_thread(self.store, url, body, etag, last_modified, truncated_at)
+
+    async def atouch(self, url: str):
+        await asyncio.to_thread(self.touch, url)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
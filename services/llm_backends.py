@@ -0,0 +1,174 @@
+import asyncio
+import json
+import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+from config.config import (
+    GOOGLE_AI_API_KEY, LLM_BACKEND, LLM_MODEL_NAME,
+    FAKE_LLM_LATENCY, FAKE_LLM_LATENCY_SPREAD, FAKE_LLM_TOKENS_PER_SECOND, FAKE_LLM_FAILURE_RATE
+)
+from services.token_accounting import TokenUsage, estimate_tokens, usage_from_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    usage: TokenUsage
+
+
+@dataclass
+class LLMChunk:
+    text: str
+    # Заполняется только в последнем фрагменте потока
+    usage: Optional[TokenUsage] = None
+
+
+class LLMBackend(ABC):
+    """
+    Интерфейс языковой модели для GoogleAIService.
+
+    generate возвращает ответ целиком, stream - фрагменты текста по мере
+    готовности, последний фрагмент содержит итоговое использование токенов.
+    is_provider_failure отличает сбои сервиса модели от ошибок самого запроса.
+    """
+
+    model_name: str
+
+    def is_provider_failure(self, error: BaseException) -> bool:
+        """
+        Сбой на стороне сервиса (таймаут, ошибка соединения), а не отказ
+        по содержанию запроса. Только такие ошибки размыкают предохранитель
+        """
+        return isinstance(error, (asyncio.TimeoutError, ConnectionError, OSError))
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> LLMResponse:
+        ...
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[LLMChunk]:
+        ...
+
+
+class GeminiBackend(LLMBackend):
+    """Gemini через google.generativeai"""
+
+    def __init__(self, model_name: str = LLM_MODEL_NAME, api_key: str = GOOGLE_AI_API_KEY):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def is_provider_failure(self, error: BaseException) -> bool:
+        # Ошибки google.api_core несут HTTP-код: 429 и 5xx - перегрузка или сбой сервиса,
+        # остальные 4xx и ValueError заблокированного ответа - ошибки конкретного запроса
+        status = getattr(error, 'code', None)
+        if isinstance(status, int):
+            return status == 429 or status >= 500
+        return super().is_provider_failure(error)
+
+    async def generate(self, prompt: str) -> LLMResponse:
+        response = await self.model.generate_content_async(prompt)
+        return LLMResponse(response.text, usage_from_response(response, prompt, response.text))
+
+    async def stream(self, prompt: str) -> AsyncIterator[LLMChunk]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        text = ""
+        async for chunk in response:
+            if chunk.text:
+                text += chunk.text
+                yield LLMChunk(chunk.text)
+
+        # После завершения потока usage_metadata содержит итоговые значения
+        yield LLMChunk("", usage_from_response(response, prompt, text))
+
+
+class FakeLLMError(Exception):
+    """Искусственный сбой FakeBackend"""
+
+
+class FakeBackend(LLMBackend):
+    """
+    Локальная замена модели для тестов и замеров без сети и ключа API.
+
+    Задержка до первого токена берется из логнормального распределения с
+    медианой latency и разбросом spread (sigma логарифма), текст выдается
+    со скоростью tokens_per_second. С вероятностью failure_rate вызов
+    завершается FakeLLMError.
+    """
+
+    def __init__(
+        self,
+        latency: float = FAKE_LLM_LATENCY,
+        spread: float = FAKE_LLM_LATENCY_SPREAD,
+        tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+        failure_rate: float = FAKE_LLM_FAILURE_RATE,
+        response_tokens: int = 150,
+        chunk_tokens: int = 20,
+        seed: Optional[int] = None
+    ):
+        self.model_name = 'fake'
+        self.latency = latency
+        self.spread = spread
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.response_tokens = response_tokens
+        self.chunk_tokens = chunk_tokens
+        self._random = random.Random(seed)
+
+    def is_provider_failure(self, error: BaseException) -> bool:
+        return isinstance(error, FakeLLMError) or super().is_provider_failure(error)
+
+    def _first_token_latency(self) -> float:
+        if self.spread <= 0:
+            return self.latency
+        return self.latency * self._random.lognormvariate(0, self.spread)
+
+    def _maybe_fail(self):
+        if self._random.random() < self.failure_rate:
+            raise FakeLLMError("Injected fake LLM failure")
+
+    def _make_text(self, prompt: str) -> str:
+        words = ["Регулярные", "занятия", "и", "поддержка", "семьи", "помогают", "ребенку", "развиваться."]
+        text = " ".join(words[i % len(words)] for i in range(self.response_tokens))
+
+        # Ответ в формате, который ожидает режим one_shot генерации постов
+        if '"content"' in prompt:
+            return json.dumps({'structure': 'вступление, советы, вывод', 'content': text}, ensure_ascii=False)
+        return text
+
+    async def generate(self, prompt: str) -> LLMResponse:
+        text = self._make_text(prompt)
+        await asyncio.sleep(self._first_token_latency() + self.response_tokens / self.tokens_per_second)
+        self._maybe_fail()
+        return LLMResponse(text, TokenUsage(estimate_tokens(prompt), self.response_tokens))
+
+    async def stream(self, prompt: str) -> AsyncIterator[LLMChunk]:
+        words = self._make_text(prompt).split(" ")
+        await asyncio.sleep(self._first_token_latency())
+        self._maybe_fail()
+
+        for start in range(0, len(words), self.chunk_tokens):
+            part = words[start:start + self.chunk_tokens]
+            await asyncio.sleep(len(part) / self.tokens_per_second)
+            # Сбой может произойти и посреди потока
+            if self.failure_rate and self._random.random() < self.failure_rate / 10:
+                raise FakeLLMError("Injected fake LLM failure mid-stream")
+            yield LLMChunk(" ".join(part) + (" " if start + self.chunk_tokens < len(words) else ""))
+
+        yield LLMChunk("", TokenUsage(estimate_tokens(prompt), self.response_tokens))
+
+
+def create_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    """Создание бэкенда модели по имени из конфигурации"""
+    if name == 'fake':
+        logger.warning("Using FakeBackend instead of a real LLM")
+        return FakeBackend()
+    if name == 'gemini':
+        return GeminiBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -0,0 +1,153 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from config.config import (
+    LLM_MAX_CONCURRENCY, LLM_RPM_LIMIT, LLM_TPM_LIMIT, LLM_MAX_QUEUE_DEPTH, LLM_MAX_QUEUE_WAIT
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: меньшее значение обслуживается раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class LLMOverloaded(Exception):
+    """Запрос отклонен планировщиком: очередь переполнена или ожидание слишком долгое"""
+
+
+class TokenBucket:
+    """
+    Маркерная корзина: capacity единиц, пополняется равномерно за минуту.
+    Лимит 0 отключает ограничение.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        """Сколько секунд ждать, пока в корзине наберется amount"""
+        if not self.capacity:
+            return 0
+        self._refill()
+        # Запрос больше всей корзины пропускается при полной корзине
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if not self.capacity:
+            return
+        self._refill()
+        # Баланс может уйти в минус, если фактический расход больше оценки
+        self.tokens -= amount
+
+
+class LLMScheduler:
+    """
+    Планировщик запросов к модели.
+
+    Запросы ждут в очереди по приоритету (интерактивные ответы раньше
+    фоновой генерации постов) и допускаются, когда есть свободный слот
+    и хватает запросов и токенов в минутных корзинах. При переполнении
+    очереди или долгом ожидании запрос сразу отклоняется LLMOverloaded,
+    фоновые запросы отклоняются уже при заполнении очереди наполовину.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = LLM_MAX_CONCURRENCY,
+        requests_per_minute: int = LLM_RPM_LIMIT,
+        tokens_per_minute: int = LLM_TPM_LIMIT,
+        max_queue_depth: int = LLM_MAX_QUEUE_DEPTH,
+        max_queue_wait: float = LLM_MAX_QUEUE_WAIT
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_wait = max_queue_wait
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self.stats = {'granted': 0, 'shed': 0, 'timed_out': 0}
+        self._queue = []
+        self._counter = itertools.count()
+        self._timer = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for item in self._queue if not item[2].done())
+
+    @asynccontextmanager
+    async def slot(self, priority: int, estimated_tokens: int = 0):
+        """Ожидание слота для одного запроса к модели"""
+        await self._acquire(priority, estimated_tokens)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._pump()
+
+    def record_extra_call(self, estimated_tokens: int = 0):
+        """Учет дополнительного запроса внутри уже выданного слота (дублирующий запрос)"""
+        self.requests.consume(1)
+        self.tokens.consume(estimated_tokens)
+
+    def record_tokens(self, extra_tokens: int):
+        """Учет разницы между фактическим и оценочным расходом токенов"""
+        if extra_tokens > 0:
+            self.tokens.consume(extra_tokens)
+
+    async def _acquire(self, priority: int, estimated_tokens: int):
+        depth = self.queue_depth
+        limit = self.max_queue_depth if priority == PRIORITY_INTERACTIVE else self.max_queue_depth // 2
+        if depth >= limit:
+            self.stats['shed'] += 1
+            logger.warning(f"LLM queue is full ({depth}), shedding request with priority {priority}")
+            raise LLMOverloaded("LLM queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), future, estimated_tokens))
+        self._pump()
+
+        try:
+            await asyncio.wait_for(future, timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            self.stats['timed_out'] += 1
+            logger.warning(f"LLM request waited more than {self.max_queue_wait}s in queue")
+            raise LLMOverloaded("LLM queue wait timeout")
+
+    def _pump(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue and self.in_flight < self.max_in_flight:
+            priority, _, future, estimated_tokens = self._queue[0]
+            if future.done():
+                # Запрос отменен или снят по таймауту
+                heapq.heappop(self._queue)
+                continue
+
+            wait = max(self.requests.time_until(1), self.tokens.time_until(estimated_tokens))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._pump)
+                break
+
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            self.tokens.consume(estimated_tokens)
+            self.in_flight += 1
+            self.stats['granted'] += 1
+            future.set_result(None)
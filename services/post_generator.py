@@ -1,9 +1,12 @@
+import json
 import random
 import re
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
-from config.config import POST_TEMPLATES
+from config.config import POST_TEMPLATES, POST_GENERATION_MODE
 from services.google_ai import GoogleAIService
+from database.async_db_manager import AsyncDBManager
+from services.crawler import Crawler
 from services.scraper import Scraper
 from utils.text_processor import clean_text, format_message
 import logging
@@ -30,9 +33,35 @@ class PostGenerator:
         'default': ['#здоровье']
     }
 
-    def __init__(self, ai_service: GoogleAIService, scraper: Scraper):
+    def __init__(
+        self,
+        ai_service: GoogleAIService,
+        scraper: Scraper,
+        crawler: Optional[Crawler] = None,
+        article_store: Optional[AsyncDBManager] = None
+    ):
         self.ai_service = ai_service
-        self.scraper = Scraper()
+        self.scraper = scraper
+        # Материалы, заранее собранные фоновым обходом источников
+        self.crawler = crawler
+        # Хранилище статей: свежие неиспользованные статьи по категориям
+        self.article_store = article_store
+
+    async def _pick_article(self, category: str) -> Optional[Dict]:
+        if self.article_store:
+            article = await self.article_store.pick_fresh_article(category)
+            return article.to_dict() if article else None
+        
+        if self.crawler:
+            # Скрапинг не выполняется во время генерации: только готовые материалы
+            articles = self.crawler.get_articles(category)
+        else:
+            articles = await self.scraper.scrape_by_category(category)
+        
+        if not articles:
+            return None
+        logger.info(f"Доступно статей: {len(articles)}")
+        return random.choice(articles)
 
     def extract_key_points(self, text: str, max_points: int = 4, max_length: int = 150) -> str:
         """
@@ -71,22 +100,80 @@ class PostGenerator:
         
         return '\n• ' + '\n• '.join(key_points) if key_points else 'Ключевые моменты не определены'
 
-    async def generate_ai_post(self, category: str, post_type: str = 'advice') -> Optional[str]:
+    async def _generate_one_shot(self, structure_prompt: str, requirements: str, use_cache: bool = False) -> str:
+        """
+        Получает структуру и содержание поста одним запросом к модели
+        """
+        prompt = f"""
+        {structure_prompt}
+
+        Сначала придумай уникальную структуру поста, затем сразу наполни ее содержанием.
+        Требования:
+        {requirements}
+
+        Ответь строго в формате JSON без пояснений и разметки:
+        {{"structure": "краткое описание структуры", "content": "готовый текст поста"}}
+        """
+        response = await self.ai_service.generate_post(prompt, use_cache=use_cache)
+
+        # Модель может обернуть JSON в блок кода
+        cleaned = re.sub(r'^```(?:json)?\s*|\s*```$', '', response.strip())
+        try:
+            data = json.loads(cleaned)
+            if isinstance(data, dict) and data.get('content'):
+                return data['content']
+        except json.JSONDecodeError:
+            pass
+
+        logger.warning("Ответ в режиме one_shot не является JSON, используется как есть")
+        return response
+
+    async def mark_article_used(self, article_id: int):
+        """
+        Статья из хранилища больше не предлагается для новых постов.
+        Вызывается при публикации: до нее повторная генерация берет ту же статью
+        и может получить ответ модели из кэша
+        """
+        if self.article_store:
+            try:
+                await self.article_store.mark_article_used(article_id)
+            except Exception as e:
+                # Пост уже опубликован, ошибка отметки не должна выглядеть как ошибка публикации
+                logger.error(f"Не удалось отметить статью {article_id} использованной: {e}")
+
+    async def generate_ai_post(self, category: str, post_type: str = 'advice', mode: Optional[str] = None) -> Optional[str]:
         """
         Генерирует пост с абсолютно уникальной структурой 
         в двух сценариях: с использованием сайтов и полностью через ИИ
+
+        :param mode: 'two_stage' - структура и содержание отдельными запросами,
+                     'one_shot' - одним запросом (по умолчанию POST_GENERATION_MODE)
         """
+        post, _ = await self.generate_ai_post_draft(category, post_type, mode)
+        return post
+
+    async def generate_ai_post_draft(
+        self,
+        category: str,
+        post_type: str = 'advice',
+        mode: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[int]]:
+        """
+        То же, что generate_ai_post, но вместе с id статьи из хранилища, на которой
+        основан пост (None для поста без статьи), чтобы отметить ее при публикации
+        """
+        mode = mode or POST_GENERATION_MODE
+        article_id = None
         try:
             # Случайный выбор стратегии генерации
             use_articles = random.choice([True, False])
             
             if use_articles:
                 # Попытка найти статьи
-                articles = await self.scraper.scrape_by_category(category or random.choice(['здоровье', 'психология', 'питание']))
+                source_article = await self._pick_article(category or random.choice(['здоровье', 'психология', 'питание']))
                 
-                if articles:
-                    source_article = random.choice(articles)
-                    logger.info(f"Выбрана статья: {source_article['title']} из {len(articles)} доступных")
+                if source_article:
+                    logger.info(f"Выбрана статья: {source_article['title']}")
                     
                     # Промпт для создания уникальной структуры на основе статьи
                     structure_prompt = f"""
@@ -104,25 +191,37 @@ class PostGenerator:
                     {source_article['content'][:500]}
                     """
 
-                    # Генерация уникальной структуры
-                    unique_structure = await self.ai_service.generate_post(structure_prompt)
+                    if mode == 'one_shot':
+                        raw_content = await self._generate_one_shot(
+                            structure_prompt,
+                            "- Сохранять суть исходной статьи\n"
+                            "- Максимально креативно интерпретировать информацию",
+                            use_cache=True
+                        )
+                    else:
+                        # Генерация уникальной структуры (промпт по статье можно брать из кэша)
+                        unique_structure = await self.ai_service.generate_post(structure_prompt, use_cache=True)
 
-                    # Промпт для наполнения уникальной структуры контентом
-                    content_prompt = f"""
-                    Наполни следующую уникальную структуру контентом из статьи:
+                        # Промпт для наполнения уникальной структуры контентом
+                        content_prompt = f"""
+                        Наполни следующую уникальную структуру контентом из статьи:
 
-                    Структура: {unique_structure}
-                    Исходная статья: "{source_article['title']}"
-                    Содержание статьи: {source_article['content'][:700]}
+                        Структура: {unique_structure}
+                        Исходная статья: "{source_article['title']}"
+                        Содержание статьи: {source_article['content'][:700]}
 
-                    Требования:
-                    - Полностью соответствовать сгенерированной структуре
-                    - Сохранять суть исходной статьи
-                    - Максимально креативно интерпретировать информацию
-                    """
+                        Требования:
+                        - Полностью соответствовать сгенерированной структуре
+                        - Сохранять суть исходной статьи
+                        - Максимально креативно интерпретировать информацию
+                        """
 
-                    # Генерация контента в уникальной структуре
-                    raw_content = await self.ai_service.generate_post(content_prompt)
+                        # Генерация контента в уникальной структуре
+                        raw_content = await self.ai_service.generate_post(content_prompt, use_cache=True)
+                    
+                    # Статья отмечается использованной только при публикации поста
+                    if self.article_store:
+                        article_id = source_article.get('id')
                     
                     # Метаданные поста
                     post_content = {
@@ -153,24 +252,31 @@ class PostGenerator:
                 - Целевая аудитория: Родители детей с особенностями развития
                 """
 
-                # Генерация уникальной структуры
-                unique_structure = await self.ai_service.generate_post(structure_prompt)
+                if mode == 'one_shot':
+                    raw_content = await self._generate_one_shot(
+                        structure_prompt,
+                        "- Сохранять эмоциональность и креативность\n"
+                        "- Избегать прямых инструкций"
+                    )
+                else:
+                    # Генерация уникальной структуры
+                    unique_structure = await self.ai_service.generate_post(structure_prompt)
 
-                # Промпт для наполнения уникальной структуры контентом
-                content_prompt = f"""
-                Наполни следующую уникальную структуру содержанием:
+                    # Промпт для наполнения уникальной структуры контентом
+                    content_prompt = f"""
+                    Наполни следующую уникальную структуру содержанием:
 
-                Структура: {unique_structure}
-                Тема: {category}
+                    Структура: {unique_structure}
+                    Тема: {category}
 
-                Требования:
-                - Полностью соответствовать сгенерированной структуре
-                - Сохранять эмоциональность и креативность
-                - Избегать прямых инструкций
-                """
+                    Требования:
+                    - Полностью соответствовать сгенерированной структуре
+                    - Сохранять эмоциональность и креативность
+                    - Избегать прямых инструкций
+                    """
 
-                # Генерация контента в уникальной структуре
-                raw_content = await self.ai_service.generate_post(content_prompt)
+                    # Генерация контента в уникальной структуре
+                    raw_content = await self.ai_service.generate_post(content_prompt)
                 
                 # Метаданные поста
                 post_content = {
@@ -192,11 +298,11 @@ class PostGenerator:
                 f"{disclaimer}"
             )
             
-            return format_message(final_post)
+            return format_message(final_post), article_id
                 
         except Exception as e:
             logger.error(f"Ошибка при генерации поста с уникальной структурой: {str(e)}", exc_info=True)
-            return None
+            return None, None
 
 
 
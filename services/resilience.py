@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+from config.config import (
+    LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_TIMEOUT,
+    LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    """Вызов не выполнен: предохранитель разомкнут после серии сбоев"""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для вызовов внешнего сервиса.
+
+    closed - вызовы проходят; после failure_threshold сбоев подряд
+    переходит в open - вызовы сразу отклоняются. Через reset_timeout
+    переходит в half_open и пропускает один пробный вызов: успех
+    замыкает предохранитель, сбой снова размыкает.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = LLM_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probe_in_flight = False
+        self.stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info("Circuit breaker half-open, allowing a probe request")
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.stats['rejected'] += 1
+        return False
+
+    def record_success(self):
+        self.stats['successes'] += 1
+        self._failures = 0
+        if self._state != self.CLOSED:
+            logger.info("Circuit breaker closed")
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.stats['failures'] += 1
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.stats['opened'] += 1
+                logger.warning(f"Circuit breaker opened after {self._failures} consecutive failures")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Пробный вызов завершился без результата (например, отменен)"""
+        self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Скользящее окно последних задержек для расчета перцентилей"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, latency: float):
+        self._samples.append(latency)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+
+class Hedger:
+    """
+    Дублирующие (hedged) запросы: если первый вызов не завершился за
+    перцентиль LLM_HEDGE_PERCENTILE наблюдаемых задержек, запускается
+    второй такой же, берется первый успешный результат, другой отменяется.
+
+    allow_hedge вызывается в момент дублирования: False - второй вызов не
+    запускается. on_abandoned вызывается для каждого отмененного вызова.
+    """
+
+    def __init__(self, percentile: float = LLM_HEDGE_PERCENTILE, min_samples: int = LLM_HEDGE_MIN_SAMPLES):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latency = LatencyTracker()
+        self.stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'hedge_skipped': 0}
+
+    def hedge_delay(self) -> Optional[float]:
+        # Пока данных мало, дублирование не используется
+        if len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.percentile)
+
+    async def run(
+        self,
+        factory: Callable[[], Awaitable],
+        allow_hedge: Optional[Callable[[], bool]] = None,
+        on_abandoned: Optional[Callable[[], None]] = None
+    ):
+        self.stats['calls'] += 1
+        started = time.monotonic()
+        delay = self.hedge_delay()
+
+        primary = asyncio.ensure_future(factory())
+        if delay is None:
+            result = await primary
+            self.latency.add(time.monotonic() - started)
+            return result
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if not done and allow_hedge and not allow_hedge():
+            self.stats['hedge_skipped'] += 1
+            # Дубль встал бы в очередь за ожидающими запросами и не успел бы раньше первого
+            await asyncio.wait({primary})
+            done = {primary}
+        if done:
+            result = primary.result()
+            self.latency.add(time.monotonic() - started)
+            return result
+
+        self.stats['hedged'] += 1
+        logger.info(f"LLM call exceeded p{self.percentile} ({delay:.2f}s), sending hedged request")
+        hedge = asyncio.ensure_future(factory())
+        pending = {primary, hedge}
+        error = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats['hedge_wins'] += 1
+                        self.latency.add(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+                if on_abandoned:
+                    on_abandoned()
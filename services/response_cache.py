@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from config.config import LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MEMORY_SIZE, LLM_CACHE_MAX_ENTRIES
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Кэш ответов модели, адресуемый хэшем имени модели и промпта.
+
+    Два уровня: LRU в памяти процесса и таблица SQLite на диске, которая
+    переживает перезапуски. Записи старше ttl не отдаются, при превышении
+    max_entries с диска удаляются давно не использованные записи.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        ttl: int = LLM_CACHE_TTL,
+        memory_size: int = LLM_CACHE_MEMORY_SIZE,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, created_at: float, response: str):
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        with self._lock:
+            item = self._memory.get(key)
+            if item and now - item[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return item[1]
+
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl)
+            ).fetchone()
+
+            if not row:
+                self._memory.pop(key, None)
+                self.stats['misses'] += 1
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, row[1], row[0])
+            self.stats['disk_hits'] += 1
+            return row[0]
+
+    def set(self, key: str, response: str):
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, response)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        expired = self._conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,)).rowcount
+        overflow = self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        if expired or overflow:
+            self.stats['evictions'] += expired + overflow
+            logger.info(f"LLM cache evicted {expired} expired and {overflow} least recently used entries")
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, response: str):
+        await asyncio.to_thread(self.set, key, response)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
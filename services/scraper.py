@@ -1,19 +1,37 @@
 import aiohttp
-from bs4 import BeautifulSoup
 import asyncio
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Tuple, Union
 from datetime import datetime
 import logging
-from config.config import MedicalSource, MEDICAL_SOURCES
-import socket
-from urllib.parse import urlparse
-from functools import lru_cache
+import re
+from config.config import (
+    MedicalSource, MEDICAL_SOURCES,
+    CONCURRENT_REQUESTS, REQUEST_TIMEOUT, MAX_RETRIES, SCRAPER_DNS_CACHE_TTL, SCRAPER_KEEPALIVE_TIMEOUT,
+    HTTP_CACHE_ENABLED, HTTP_CACHE_FRESHNESS, SCRAPER_MAX_BYTES
+)
+from services.fetch_scheduler import FetchScheduler, FetchThrottled, parse_retry_after
+from services.host_health import HostHealthCache
+from services.html_parser import HtmlParserPool
+from services.http_cache import HttpCache
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Размер фрагмента при потоковом чтении страницы
+STREAM_CHUNK_SIZE = 64 * 1024
+# Первая контрольная точка проверки селекторов, далее размер удваивается
+FIRST_CHECKPOINT = 128 * 1024
+
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+def matches_category(categories: List[str], category: str) -> bool:
+    """Подходит ли источник с категориями categories для запрошенной категории"""
+    return category in categories or any(cat in category for cat in categories)
+
+
 class Scraper:
-    def __init__(self, timeout: int = 60, max_retries: int = 3):
+    def __init__(self, timeout: int = REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -21,18 +39,122 @@ class Scraper:
         }
         self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.max_retries = max_retries
+        # Общие сессии: по одной на SSL-профиль, соединения переиспользуются
+        self._sessions: Dict[object, aiohttp.ClientSession] = {}
+        # Общий лимит одновременных запросов и ограничения по хостам
+        self.fetch_scheduler = FetchScheduler()
+        # Кэш доступности хостов, общий для всех одновременных скрапингов
+        self.host_health = HostHealthCache()
+        # Дисковый кэш страниц для условных запросов
+        self.http_cache = HttpCache() if HTTP_CACHE_ENABLED else None
+        # Разбор HTML в отдельных процессах, чтобы не блокировать бота
+        self.parser_pool = HtmlParserPool()
+
+    async def start(self):
+        """Запуск скрапера: сессии пула создаются при первом запросе к источнику"""
+        logger.info(f"Scraper started, global request limit {self.fetch_scheduler.global_limit}")
+
+    async def close(self):
+        """Закрытие всех сессий и соединений пула"""
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            await session.close()
+        if self.http_cache:
+            self.http_cache.close()
+            self.http_cache = None
+        self.parser_pool.close()
+
+    @staticmethod
+    def _ssl_profile(source: MedicalSource):
+        return source.ssl_context or (False if not source.verify_ssl else None)
+
+    def _get_session(self, ssl_profile) -> aiohttp.ClientSession:
+        """Сессия для SSL-профиля: None - проверка по умолчанию, False - без проверки, либо SSLContext"""
+        key = ssl_profile if ssl_profile is None or ssl_profile is False else id(ssl_profile)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                ssl=ssl_profile,
+                limit=CONCURRENT_REQUESTS,
+                ttl_dns_cache=SCRAPER_DNS_CACHE_TTL,
+                keepalive_timeout=SCRAPER_KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True
+            )
+            session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=self.timeout,
+                connector=connector
+            )
+            self._sessions[key] = session
+        return session
+
+    async def _fetch_html(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        cache_ttl: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        selectors: Optional[Dict[str, Union[str, List[str]]]] = None,
+        parser: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Загрузка HTML через HTTP-кэш: свежая копия отдается с диска без запроса,
+        иначе выполняется условный запрос, и ответ 304 обслуживается из кэша.
+        Тело читается потоком не больше max_bytes (см. _read_html)
+        """
+        max_bytes = max_bytes or SCRAPER_MAX_BYTES
+        cached = await self.http_cache.aget(url) if self.http_cache else None
+        if cached and cached.truncated_at not in (None, max_bytes):
+            # Тело обрезано по другому лимиту и не совпадает с тем, что вернул бы запрос
+            cached = None
+        freshness = HTTP_CACHE_FRESHNESS if cache_ttl is None else cache_ttl
+
+        if cached:
+            if cached.age() < freshness:
+                self.http_cache.stats['fresh_hits'] += 1
+                return cached.body
+            headers = {**(headers or {}), **cached.conditional_headers()}
+        elif self.http_cache:
+            self.http_cache.stats['misses'] += 1
+
+        async with self.fetch_scheduler.slot(url):
+            async with session.get(url, headers=headers, allow_redirects=True) as response:
+                if response.status == 304 and cached:
+                    logger.info(f"Страница {url} не изменилась, используется кэш")
+                    self.http_cache.stats['revalidated'] += 1
+                    await self.http_cache.atouch(url)
+                    return cached.body
+
+                if response.status in {429, 503}:
+                    raise FetchThrottled(url, response.status, parse_retry_after(response.headers.get('Retry-After')))
+
+                if response.status not in {200, 302}:
+                    logger.error(f"Статус {response.status} для {url}")
+                    return None
+
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                cacheable = self.http_cache and response.status == 200
+                # Страница с валидаторами дочитывается до конца (в пределах max_bytes):
+                # тогда ее можно кэшировать и в следующий раз получить 304 вместо тела
+                early_stop = None if cacheable and (etag or last_modified) else selectors
+
+                html, complete = await self._read_html(response, max_bytes, early_stop, parser)
+
+                # Тело после ранней остановки не кэшируется: ответ 304 вернул бы его как всю страницу.
+                # Обрезанное по лимиту хранится вместе с лимитом
+                if cacheable and (complete or not early_stop):
+                    await self.http_cache.astore(
+                        url, html, etag=etag, last_modified=last_modified,
+                        truncated_at=None if complete else max_bytes
+                    )
+
+        return html
 
-    @lru_cache(maxsize=100)
     async def check_host_availability(self, url: str) -> bool:
         """Кэшированная проверка доступности хоста"""
-        try:
-            parsed_url = urlparse(url)
-            host = parsed_url.netloc
-            socket.gethostbyname(host)
-            return True
-        except socket.gaierror:
-            logger.error(f"Хост {host} недоступен")
-            return False
+        return await self.host_health.is_available(url)
 
     async def scrape_by_category(self, category: str, language: str = 'ru') -> List[Dict]:
         """
@@ -51,7 +173,7 @@ class Scraper:
             # Фильтруем источники по категории и языку
             filtered_sources = [
                 source for source in MEDICAL_SOURCES
-                if (category in source.category or any(cat in category for cat in source.category))
+                if matches_category(source.category, category)
                 and source.language == language
             ]
             
@@ -92,36 +214,73 @@ class Scraper:
             logger.warning(f"Ошибка при извлечении ключевых слов: {e}")
             return []
 
-    async def find_content(self, soup: BeautifulSoup, selectors: Dict[str, Union[str, List[str]]]) -> Dict[str, Optional[str]]:
-        result = {'title': None, 'content': None, 'article': None}
-        
-        for field, field_selectors in selectors.items():
-            if isinstance(field_selectors, str):
-                field_selectors = [field_selectors]
-            
-            for selector in field_selectors:
-                try:
-                    elements = soup.select(selector)
-                    for element in elements:
-                        text = element.get_text(strip=True)
-                        if text and len(text) > 50:
-                            result[field] = text
-                            logger.info(f"Найден контент для поля {field} длиной {len(text)} символов")
-                            break
-                except Exception as e:
-                    logger.warning(f"Ошибка при поиске {field} с селектором {selector}: {str(e)}")
+    @staticmethod
+    def _decode(body: bytes, response: aiohttp.ClientResponse) -> str:
+        # Кодировка из Content-Type, затем из <meta charset>, по умолчанию utf-8
+        encoding = response.charset
+        if not encoding:
+            match = META_CHARSET_RE.search(body[:4096])
+            encoding = match.group(1).decode('ascii') if match else 'utf-8'
+        try:
+            return body.decode(encoding, errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+
+    async def _read_html(
+        self,
+        response: aiohttp.ClientResponse,
+        max_bytes: int,
+        selectors: Optional[Dict[str, Union[str, List[str]]]] = None,
+        parser: Optional[str] = None
+    ) -> Tuple[str, bool]:
+        """
+        Потоковое чтение страницы не больше max_bytes, возвращает (html, прочитана ли целиком).
+
+        Если заданы селекторы, на контрольных точках (128 КБ, 256 КБ, ...)
+        прочитанная часть разбирается, и чтение прекращается, когда все поля
+        найдены и результат не изменился с предыдущей точки: так не
+        принимается текст элемента, обрезанный на границе фрагмента.
+        """
+        body = bytearray()
+        checkpoint = FIRST_CHECKPOINT
+        previous = None
+        complete = True
+
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            body += chunk
+            if len(body) >= max_bytes:
+                logger.warning(f"Страница {response.url} обрезана до {max_bytes} байт")
+                del body[max_bytes:]
+                complete = False
+                break
+
+            if selectors and len(body) >= checkpoint:
+                checkpoint *= 2
+                result = await self.parser_pool.extract_content(self._decode(bytes(body), response), selectors, parser)
+                if all(result.get(field) for field in selectors) and result == previous:
+                    logger.info(f"Все поля найдены, чтение {response.url} остановлено на {len(body)} байтах")
+                    complete = False
+                    break
+                previous = result
+
+        return self._decode(bytes(body), response), complete
+
+    async def find_content(self, html: str, selectors: Dict[str, Union[str, List[str]]], parser: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """Разбор страницы и поиск полей по селекторам в пуле процессов"""
+        result = await self.parser_pool.extract_content(html, selectors, parser)
         
         # Логируем результаты поиска
         for field, value in result.items():
             if value is None:
                 logger.warning(f"Не найден контент для поля {field}")
             else:
-                logger.info(f"Успешно найден контент для поля {field}")
+                logger.info(f"Успешно найден контент для поля {field} длиной {len(value)} символов")
         
         return result
 
-    async def scrape_with_retry(self, source: MedicalSource, max_retries: int = 3) -> Optional[Dict]:
+    async def scrape_with_retry(self, source: MedicalSource, max_retries: Optional[int] = None) -> Optional[Dict]:
         """Скрапит медицинский контент с механизмом повторных попыток"""
+        max_retries = max_retries or self.max_retries
         logger.info(f"Начало скрапинга источника {source.name} ({source.url})")
         
         # Проверяем доступность хоста перед скрапингом
@@ -130,6 +289,7 @@ class Scraper:
             return None
 
         for attempt in range(max_retries):
+            throttled = None
             try:
                 result = await self.scrape_medical_source(source)
                 
@@ -138,16 +298,24 @@ class Scraper:
                     return result
                 else:
                     logger.warning(f"Скрапинг не удался для {source.name} (попытка {attempt + 1})")
-                
-                if attempt < max_retries - 1:
-                    delay = min(2 ** attempt, 10)
-                    logger.warning(f"Попытка {attempt + 1} не удалась для {source.url}. Ожидание {delay} секунд.")
-                    await asyncio.sleep(delay)
+            except FetchThrottled as e:
+                logger.warning(f"Попытка {attempt + 1} для {source.url}: {e}")
+                throttled = e
+                if self.fetch_scheduler.should_give_up(e.retry_after):
+                    # Retry-After соблюдается полностью: хост ждет весь срок, источник - до следующего обхода
+                    self.fetch_scheduler.penalize(source.url, e.retry_after)
+                    logger.warning(f"{source.url} просит повторить через {e.retry_after:.0f} с, источник пропущен в этом обходе")
+                    return None
             except Exception as e:
                 logger.error(f"Попытка {attempt + 1} не удалась для {source.url}: {str(e)}", exc_info=True)
-                if attempt < max_retries - 1:
-                    delay = min(2 ** attempt, 10)
-                    await asyncio.sleep(delay)
+            
+            if attempt < max_retries - 1:
+                delay = self.fetch_scheduler.backoff_delay(attempt, throttled.retry_after if throttled else None)
+                if throttled:
+                    # Остальные запросы к этому хосту тоже ждут
+                    self.fetch_scheduler.penalize(source.url, delay)
+                logger.warning(f"Попытка {attempt + 1} не удалась для {source.url}. Ожидание {delay:.1f} секунд.")
+                await asyncio.sleep(delay)
         
         logger.error(f"Все попытки скрапинга для {source.url} завершились неудачно")
         return None
@@ -155,47 +323,35 @@ class Scraper:
     async def scrape_medical_source(self, source: MedicalSource) -> Optional[Dict]:
         """Безопаснее и информативнее скрапит источник"""
         try:
-            if not await self.check_host_availability(source.url):
-                return None
+            session = self._get_session(self._ssl_profile(source))
 
-            ssl_context = source.ssl_context or (False if not source.verify_ssl else None)
-            connector = aiohttp.TCPConnector(
-                ssl=ssl_context, 
-                force_close=True, 
-                enable_cleanup_closed=True, 
-                limit_per_host=1
+            # Заголовки источника передаются в запрос и дополняют заголовки сессии
+            html = await self._fetch_html(
+                session, source.url, source.headers, source.cache_ttl,
+                max_bytes=source.max_bytes, selectors=source.selectors, parser=source.parser
             )
+            if html is None:
+                return None
 
-            async with aiohttp.ClientSession(
-                headers={**self.headers, **(source.headers or {})},
-                timeout=self.timeout,
-                connector=connector
-            ) as session:
-                async with session.get(source.url, allow_redirects=True) as response:
-                    if response.status not in {200, 302}:
-                        logger.error(f"Статус {response.status} для {source.url}")
-                        return None
-
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    content_data = await self.find_content(soup, source.selectors)
-                    
-                    if not all([content_data['title'], content_data['content']]):
-                        logger.warning(f"Неполные данные для {source.url}")
-                        return None
-                    
-                    return {
-                        'title': content_data['title'],
-                        'content': content_data['content'],
-                        'keywords': self._extract_keywords(content_data['content']),
-                        'source_name': source.name,
-                        'source_url': source.url,
-                        'category': source.category,
-                        'language': source.language,
-                        'timestamp': datetime.now().isoformat()
-                    }
+            content_data = await self.find_content(html, source.selectors, source.parser)
+            
+            if not all([content_data['title'], content_data['content']]):
+                logger.warning(f"Неполные данные для {source.url}")
+                return None
+            
+            return {
+                'title': content_data['title'],
+                'content': content_data['content'],
+                'keywords': self._extract_keywords(content_data['content']),
+                'source_name': source.name,
+                'source_url': source.url,
+                'category': source.category,
+                'language': source.language,
+                'timestamp': datetime.now().isoformat()
+            }
                         
+        except FetchThrottled:
+            raise
         except Exception as e:
             logger.exception(f"Неожиданная ошибка при скрапинге {source.url}: {e}")
             return None
@@ -205,71 +361,16 @@ class Scraper:
     async def scrape_page_articles(self, url: str, max_articles: int = 10) -> List[Dict]:
         """Скрапит Multiple статей с указанной страницы"""
         try:
-            connector = aiohttp.TCPConnector(ssl=False)
-            async with aiohttp.ClientSession(headers=self.headers, connector=connector) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        logger.error(f"Не удалось получить страницу {url}. Статус: {response.status}")
-                        return []
-                    
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    articles = []
-                    
-                    # Расширенный список селекторов для поиска статей
-                    article_selectors = [
-                        '.post', 'article', '.news-item', '.article-item', 
-                        '.blog-post', '.content-block', '.entry', 
-                        '.article', '.post-item', '.card'
-                    ]
-                    
-                    for selector in article_selectors:
-                        items = soup.select(selector)
-                        if items:
-                            for item in items[:max_articles]:
-                                try:
-                                    # Более гибкий поиск заголовка и контента
-                                    title = (
-                                        item.select_one('h1, h2, h3, .title, .headline, a.title') or
-                                        item.select_one('.post-title, .entry-title')
-                                    )
-                                    
-                                    content = (
-                                        item.select_one('p, .content, .text, .excerpt, .summary') or
-                                        item.select_one('.post-content, .entry-content')
-                                    )
-                                    
-                                    # Поиск ссылки на полную статью
-                                    link = (
-                                        item.select_one('a.read-more, a.more-link, a.post-link') or
-                                        (title.find('a') if title and title.find('a') else None)
-                                    )
-                                    
-                                    if title and content:
-                                        article_data = {
-                                            'title': title.get_text(strip=True),
-                                            'content': content.get_text(strip=True)[:500],  # Ограничиваем длину контента
-                                            'url': link['href'] if link and link.has_attr('href') else url
-                                        }
-                                        
-                                        # Добавляем дополнительные метаданные, если возможно
-                                        date = item.select_one('time, .date, .post-date')
-                                        if date:
-                                            article_data['date'] = date.get_text(strip=True)
-                                        
-                                        articles.append(article_data)
-                                        
-                                        if len(articles) >= max_articles:
-                                            break
-                                except Exception as e:
-                                    logger.error(f"Ошибка при парсинге статьи: {str(e)}")
-                                    continue
-                            
-                            break  # Если нашли статьи по одному из селекторов, прекращаем поиск
-                    
-                    logger.info(f"Найдено {len(articles)} статей на странице {url}")
-                    return articles
-                    
+            session = self._get_session(False)
+            html = await self._fetch_html(session, url)
+            if html is None:
+                logger.error(f"Не удалось получить страницу {url}")
+                return []
+
+            articles = await self.parser_pool.extract_articles(html, url, max_articles)
+            logger.info(f"Найдено {len(articles)} статей на странице {url}")
+            return articles
+            
         except Exception as e:
             logger.error(f"Ошибка при скрапинге страницы {url}: {str(e)}")
             return []
\ No newline at end of file
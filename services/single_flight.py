@@ -0,0 +1,34 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов.
+
+    Первый вызов с ключом запускает работу, все последующие вызовы с тем же
+    ключом до ее завершения ждут тот же результат, не запуская работу повторно.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+
+        if task is None:
+            # Работа выполняется отдельной задачей, чтобы отмена одного
+            # из ожидающих не прерывала ее для остальных
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            logger.info(f"Joining in-flight request: {key}")
+
+        return await asyncio.shield(task)
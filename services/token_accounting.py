@@ -0,0 +1,132 @@
+import math
+import re
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from config.config import LLM_USER_TOKEN_BUDGET, LLM_USER_TOKEN_WINDOW, LLM_DAILY_TOKEN_BUDGET
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBudgetExceeded(Exception):
+    """Запрос превысил бюджет токенов пользователя или суточный бюджет"""
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    # True, если значения получены от API, а не оценены локально
+    reported: bool = False
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.response_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Локальная оценка числа токенов: слова режутся на части по 4 символа,
+    каждый знак препинания - отдельный токен
+    """
+    if not text:
+        return 0
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in re.findall(r'\w+|[^\w\s]', text))
+
+
+def usage_from_response(response, prompt: str, text: str) -> TokenUsage:
+    """
+    Использование токенов из usage_metadata ответа SDK или локальная оценка
+    """
+    metadata = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(metadata, 'prompt_token_count', 0) if metadata else 0
+    response_tokens = getattr(metadata, 'candidates_token_count', 0) if metadata else 0
+
+    if prompt_tokens or response_tokens:
+        return TokenUsage(prompt_tokens, response_tokens, reported=True)
+
+    return TokenUsage(estimate_tokens(prompt), estimate_tokens(text))
+
+
+class TokenAccountant:
+    """
+    Учет токенов по всем вызовам модели.
+
+    Хранит суммарное использование по типам вызовов, скользящее окно
+    использования каждого пользователя и суточные итоги. Бюджет 0 означает
+    отсутствие ограничения. Хуки вызываются как hook(event, user_id, usage)
+    для событий 'recorded' и 'exceeded'.
+    """
+
+    def __init__(
+        self,
+        user_budget: int = LLM_USER_TOKEN_BUDGET,
+        user_window: int = LLM_USER_TOKEN_WINDOW,
+        daily_budget: int = LLM_DAILY_TOKEN_BUDGET
+    ):
+        self.user_budget = user_budget
+        self.user_window = user_window
+        self.daily_budget = daily_budget
+        self.totals: Dict[str, TokenUsage] = defaultdict(TokenUsage)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.daily: Dict[date, int] = defaultdict(int)
+        self._user_usage: Dict[int, deque] = defaultdict(deque)
+        self.hooks: List[Callable] = []
+
+    def add_hook(self, hook: Callable):
+        self.hooks.append(hook)
+
+    def _notify(self, event: str, user_id: Optional[int], usage: TokenUsage):
+        for hook in self.hooks:
+            try:
+                hook(event, user_id, usage)
+            except Exception as e:
+                logger.error(f"Ошибка в хуке учета токенов: {e}")
+
+    def user_usage(self, user_id: int) -> int:
+        """Токены пользователя за последнее окно user_window"""
+        usage = self._user_usage.get(user_id)
+        if not usage:
+            return 0
+        cutoff = time.time() - self.user_window
+        while usage and usage[0][0] < cutoff:
+            usage.popleft()
+        return sum(tokens for _, tokens in usage)
+
+    def daily_usage(self, day: Optional[date] = None) -> int:
+        return self.daily.get(day or date.today(), 0)
+
+    def check(self, user_id: Optional[int] = None, estimated_tokens: int = 0):
+        """
+        Проверка бюджетов перед вызовом модели
+
+        :raises TokenBudgetExceeded: если вызов выйдет за бюджет
+        """
+        estimate = TokenUsage(prompt_tokens=estimated_tokens)
+
+        if self.daily_budget and self.daily_usage() + estimated_tokens > self.daily_budget:
+            self._notify('exceeded', user_id, estimate)
+            raise TokenBudgetExceeded("Исчерпан суточный бюджет токенов")
+
+        if user_id is not None and self.user_budget and self.user_usage(user_id) + estimated_tokens > self.user_budget:
+            self._notify('exceeded', user_id, estimate)
+            raise TokenBudgetExceeded(f"Исчерпан бюджет токенов пользователя {user_id}")
+
+    def record(self, kind: str, usage: TokenUsage, user_id: Optional[int] = None):
+        total = self.totals[kind]
+        total.prompt_tokens += usage.prompt_tokens
+        total.response_tokens += usage.response_tokens
+        self.calls[kind] += 1
+        self.daily[date.today()] += usage.total_tokens
+
+        if user_id is not None:
+            self._user_usage[user_id].append((time.time(), usage.total_tokens))
+
+        logger.info(
+            f"LLM tokens [{kind}]: prompt={usage.prompt_tokens}, response={usage.response_tokens}, "
+            f"{'reported' if usage.reported else 'estimated'}, today={self.daily_usage()}"
+        )
+        self._notify('recorded', user_id, usage)
@@ -1,3 +1,3 @@
-from .text_processor import clean_text, extract_keywords, format_message
+from .text_processor import clean_text, extract_keywords, format_message, normalize_question, question_hash
 
-__all__ = ['clean_text', 'extract_keywords', 'format_message']
+__all__ = ['clean_text', 'extract_keywords', 'format_message', 'normalize_question', 'question_hash']
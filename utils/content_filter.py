@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Set
+from config.config import (
+    DANGEROUS_KEYWORDS, TOXIC_KEYWORDS, CONTENT_FILTER_PATH,
+    CONTENT_FILTER_WHOLE_WORDS, CONTENT_FILTER_RELOAD_INTERVAL
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordAutomaton:
+    """
+    Автомат Ахо-Корасик для поиска всех ключевых слов за один проход по тексту.
+
+    Ключевые слова и текст приводятся к единому регистру через casefold.
+    Каждому слову сопоставлен набор меток (названий списков), в которые оно входит.
+    """
+
+    def __init__(self, keywords: Dict[str, Set[str]], whole_words: bool = False):
+        self.whole_words = whole_words
+        # Узел автомата: переходы, ссылка неудачи и найденные (длина, метки)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[tuple]] = [[]]
+
+        for keyword, labels in keywords.items():
+            self._add(keyword.casefold(), labels)
+        self._build_links()
+
+    def _add(self, keyword: str, labels: Set[str]):
+        if not keyword:
+            return
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(keyword), frozenset(labels)))
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                if self._fail[child] == child:
+                    self._fail[child] = 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _is_boundary(self, text: str, start: int, end: int) -> bool:
+        before = text[start - 1] if start > 0 else ' '
+        after = text[end] if end < len(text) else ' '
+        return not before.isalnum() and before != '_' and not after.isalnum() and after != '_'
+
+    def find_labels(self, text: str, stop_on: Iterable[str] = ()) -> Set[str]:
+        """
+        Метки всех найденных в тексте ключевых слов.
+        Поиск прекращается, как только найдена любая из меток stop_on.
+        """
+        text = text.casefold()
+        stop_on = set(stop_on)
+        found = set()
+        node = 0
+
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            for length, labels in self._output[node]:
+                end = position + 1
+                if self.whole_words and not self._is_boundary(text, end - length, end):
+                    continue
+                found |= labels
+                if found & stop_on:
+                    return found
+
+        return found
+
+
+class ContentFilter:
+    """
+    Общий фильтр запрещенного контента для всех точек входа.
+
+    Списки слов берутся из конфигурации и, если задан CONTENT_FILTER_PATH,
+    из JSON-файла вида {"dangerous": [...], "toxic": [...], "whole_words": false}.
+    Файл перечитывается без перезапуска при изменении (проверка не чаще
+    reload_interval секунд) или по вызову reload().
+    """
+
+    def __init__(self, path: str = CONTENT_FILTER_PATH, reload_interval: float = CONTENT_FILTER_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0
+        self.reload()
+
+    def _load_lists(self) -> Dict:
+        lists = {
+            'dangerous': list(DANGEROUS_KEYWORDS),
+            'toxic': list(TOXIC_KEYWORDS),
+            'whole_words': CONTENT_FILTER_WHOLE_WORDS
+        }
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                lists.update(json.load(f))
+            self._mtime = os.path.getmtime(self.path)
+        return lists
+
+    def reload(self):
+        """Перечитать списки слов и пересобрать автомат"""
+        try:
+            lists = self._load_lists()
+        except Exception as e:
+            logger.error(f"Не удалось загрузить списки фильтра контента: {e}")
+            return
+
+        keywords: Dict[str, Set[str]] = {}
+        for label in ('dangerous', 'toxic'):
+            for keyword in lists.get(label, []):
+                keywords.setdefault(keyword, set()).add(label)
+
+        automaton = KeywordAutomaton(keywords, whole_words=bool(lists.get('whole_words')))
+        with self._lock:
+            self._automaton = automaton
+        logger.info(f"Фильтр контента загружен: {len(keywords)} ключевых слов")
+
+    def _reload_if_changed(self):
+        if not self.path:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def matches(self, text: str, label: str) -> bool:
+        """Есть ли в тексте слово из списка label ('dangerous' или 'toxic')"""
+        if not text:
+            return False
+        self._reload_if_changed()
+        return label in self._automaton.find_labels(text, stop_on=(label,))
+
+
+_content_filter = None
+
+
+def get_content_filter() -> ContentFilter:
+    """Общий экземпляр фильтра контента"""
+    global _content_filter
+    if _content_filter is None:
+        _content_filter = ContentFilter()
+    return _content_filter
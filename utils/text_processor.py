@@ -1,3 +1,4 @@
+import hashlib
 import re
 from typing import List
 
@@ -40,4 +41,26 @@ def format_message(text: str, max_length: int = 4096) -> str:
     # Убираем многоточие
     result = current_part
     
-    return result
\ No newline at end of file
+    return result
+
+def normalize_question(text: str) -> str:
+    """Нормализация вопроса для сравнения и поиска в базе знаний"""
+    if not text:
+        return ""
+    
+    # Удаление знаков препинания в начале и конце, приведение к нижнему регистру
+    text = text.strip('?.,()[] ')
+    text = text.lower()
+    
+    # Удаление знаков препинания внутри текста
+    text = re.sub(r'[^\w\s]', '', text)
+    
+    # Замена похожих букв
+    text = text.replace('ё', 'е')
+    
+    # Удаление лишних пробелов
+    return ' '.join(text.split())
+
+def question_hash(normalized_text: str) -> str:
+    """Хэш нормализованного вопроса для точного поиска по индексу"""
+    return hashlib.sha1(normalized_text.encode('utf-8')).hexdigest()